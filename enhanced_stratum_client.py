@@ -0,0 +1,545 @@
+"""Hardened Stratum client with validation and performance monitoring.
+
+Builds on :mod:`stratum_security`: every inbound message is validated
+before it is acted on, share submissions are checked before they leave,
+and per-connection hash-rate / share statistics are tracked for the
+monitoring endpoints.
+"""
+
+import functools
+import json
+import socket
+import struct
+import threading
+import time
+from concurrent.futures import Future
+from typing import Optional
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    _dumps_bytes = orjson.dumps
+else:
+    def _dumps_bytes(obj):
+        return json.dumps(obj).encode("utf-8")
+
+import hashing
+from stratum_security import (SecurityConfig, SecurityError,
+                              StratumSecurityValidator)
+
+DIFF1_TARGET = 0x00000000FFFF0000000000000000000000000000000000000000000000000000
+
+
+@functools.lru_cache(maxsize=512)
+def _diff_to_target(difficulty) -> bytes:
+    """256-bit target bytes for a pool difficulty (int or float).
+
+    Pools vardiff through a small set of values, so in steady state this
+    is a dict hit instead of a division per update.  Fractional
+    difficulties are common on scrypt pools and must not be floored:
+    0.25 floored to 1 shrinks the target 4x and silently discards
+    three-quarters of the valid shares.
+    """
+    if isinstance(difficulty, float) and not difficulty.is_integer():
+        target = int(DIFF1_TARGET / difficulty)
+    else:
+        target = DIFF1_TARGET // int(difficulty)
+    return min(target, (1 << 256) - 1).to_bytes(32, "big")
+
+
+class DifficultyManager:
+    """Tracks the pool difficulty and its derived 256-bit target."""
+
+    def __init__(self):
+        self.difficulty = 1
+        self.target = _diff_to_target(1)
+
+    def update_difficulty(self, difficulty):
+        self.difficulty = difficulty
+        # cache on the value as sent — floats hash fine — so fractional
+        # vardiff keeps its exact target
+        if not difficulty or difficulty < 0:
+            difficulty = 1
+        self.target = _diff_to_target(difficulty)
+
+
+_EXTRANONCE_STRUCTS = {4: struct.Struct("<I"), 8: struct.Struct("<Q")}
+_NONCE_STRUCT = struct.Struct("<I")
+
+# mining.submit is the hottest outbound message and every field is
+# validated hex/worker-safe before it is sent, so the frame can be
+# %-formatted into a fixed byte template with no dict or JSON encoder
+# on the path.  Anything unusual (e.g. a non-alphanumeric job id) falls
+# back to the encoder.
+_SUBMIT_TEMPLATE = (b'{"id":%d,"method":"mining.submit",'
+                    b'"params":["%s","%s","%s","%s","%s"]}\n')
+
+
+class ExtranonceManager:
+    """Hands out sequential extranonce2 values for a session."""
+
+    def __init__(self, extranonce1="", extranonce2_size=4):
+        self.extranonce1 = extranonce1
+        self.extranonce2_size = extranonce2_size
+        self.extranonce2_counter = 0
+        # prebound Struct for the common 4/8-byte sizes: fixed-width C
+        # pack instead of the general int-to-bytes path per rollover
+        self._struct = _EXTRANONCE_STRUCTS.get(extranonce2_size)
+
+    def generate_extranonce2(self):
+        self.extranonce2_counter += 1
+        if self._struct is not None:
+            return self._struct.pack(self.extranonce2_counter).hex()
+        return self.extranonce2_counter.to_bytes(
+            self.extranonce2_size, "little").hex()
+
+
+class PerformanceMetrics:
+    """Per-connection hash-rate bookkeeping.
+
+    The rate is an exponentially-weighted moving average updated in O(1)
+    per sample; re-summing an interval window per hash was O(n) per
+    sample and dominated at high hash rates.
+    """
+
+    _alpha = 0.01
+
+    def __init__(self):
+        self.hash_count = 0
+        self.last_hash_time = 0.0
+        self._ema_interval = 0.0
+        self.hashes_per_second = 0.0
+
+    def record_hash(self):
+        now = time.time()
+        if self.last_hash_time:
+            interval = now - self.last_hash_time
+            if self._ema_interval:
+                self._ema_interval = (self._alpha * interval
+                                      + (1.0 - self._alpha)
+                                      * self._ema_interval)
+            else:
+                self._ema_interval = interval
+            self.hashes_per_second = (1.0 / self._ema_interval
+                                      if self._ema_interval else 0.0)
+        self.last_hash_time = now
+        self.hash_count += 1
+
+    def average_hash_rate(self):
+        return self.hashes_per_second
+
+
+class ShareStats:
+    """Accepted/rejected share counters with a recent-window view.
+
+    The recent window is ten per-minute ring buckets per outcome, so
+    recording a share is O(1) and the rate is a fixed 20-element sum
+    instead of a timestamp filter over stored shares.
+    """
+
+    def __init__(self):
+        self.accepted = 0
+        self.rejected = 0
+        self._acc_ring = [0] * 10
+        self._rej_ring = [0] * 10
+        self._ring_minute = int(time.time() // 60)
+
+    def _advance(self, minute):
+        """Zero the buckets between the last recorded minute and now."""
+        elapsed = minute - self._ring_minute
+        if elapsed <= 0:
+            return
+        for step in range(1, min(elapsed, 10) + 1):
+            slot = (self._ring_minute + step) % 10
+            self._acc_ring[slot] = 0
+            self._rej_ring[slot] = 0
+        self._ring_minute = minute
+
+    def add_accepted(self):
+        self.accepted += 1
+        minute = int(time.time() // 60)
+        self._advance(minute)
+        self._acc_ring[minute % 10] += 1
+
+    def add_rejected(self):
+        self.rejected += 1
+        minute = int(time.time() // 60)
+        self._advance(minute)
+        self._rej_ring[minute % 10] += 1
+
+    def recent_acceptance_rate(self):
+        self._advance(int(time.time() // 60))
+        accepted = sum(self._acc_ring)
+        total = accepted + sum(self._rej_ring)
+        return accepted / total if total else 1.0
+
+    def get_stats(self):
+        return {
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "recent_acceptance_rate": self.recent_acceptance_rate(),
+        }
+
+
+class StratumMonitor:
+    """Aggregates connection metrics for the stats endpoints."""
+
+    def __init__(self, enable_background_monitoring=False):
+        self.metrics = PerformanceMetrics()
+        self.shares = ShareStats()
+        # The loop does no work yet, so don't pay a thread (stack, GIL
+        # wakeups) per client for it unless a caller opts in for future
+        # alerting hooks.
+        self.monitoring_thread = None
+        if enable_background_monitoring:
+            self.monitoring_thread = threading.Thread(
+                target=self._monitoring_loop, daemon=True)
+            self.monitoring_thread.start()
+
+    def _monitoring_loop(self):
+        # placeholder for future alerting hooks
+        while True:
+            time.sleep(60)
+
+    def get_stats(self):
+        return {
+            "hash_rate": self.metrics.hashes_per_second,
+            "total_hashes": self.metrics.hash_count,
+            "shares": self.shares.get_stats(),
+        }
+
+
+# Shared default config: the compiled patterns live at module level in
+# stratum_security and the config is connection-independent.  The
+# validator itself is per client — replay history must not be shared,
+# or one pool's notification suppresses an identical (and legitimate)
+# one arriving on another connection within the replay window.
+_DEFAULT_CONFIG = SecurityConfig()
+
+
+class EnhancedStratumClient:
+    """Stratum client that validates everything it receives and sends."""
+
+    def __init__(self, host, port, username, password="x",
+                 security_config: Optional[SecurityConfig] = None,
+                 security_validator: Optional[StratumSecurityValidator] = None,
+                 monitor: Optional[StratumMonitor] = None,
+                 coin: str = "ltc"):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self._username_b = username.encode("utf-8")
+        # safe to %-splice into the raw submit template only if no JSON
+        # escaping is ever needed; validate_worker_name permits
+        # backslashes, which would splice in as invalid escapes
+        self._username_template_safe = ('"' not in username
+                                        and "\\" not in username)
+        # chains this session's shares count toward: the primary coin
+        # plus any aux chains registered via subscribe_aux
+        self.coin = coin
+        self.active_coins = [coin]
+
+        if security_validator is not None:
+            self.security_validator = security_validator
+        elif security_config is not None:
+            self.security_validator = StratumSecurityValidator(security_config)
+        else:
+            self.security_validator = StratumSecurityValidator(
+                _DEFAULT_CONFIG)
+        self.monitor = monitor if monitor is not None else StratumMonitor()
+        self.difficulty_manager = DifficultyManager()
+        self.extranonce_manager = ExtranonceManager()
+
+        self.sock = None
+        self._rx_buf = bytearray()
+        self._tx_buf = bytearray(4096)
+        self.message_id = 0
+        # responses awaited by message id; fulfilled by the reader thread
+        self._pending: dict = {}
+        self._pending_lock = threading.Lock()
+        self._reader_thread = None
+        self.job_lock = threading.Lock()
+        self.current_job = None
+        self.job_extranonce2 = None
+        self.job_midstate = None
+        self.job_tail = None
+        # pre-parsed job fields; the hex is constant within a job, so
+        # every bytes.fromhex / [::-1] happens once per notify here
+        self.version_be = b""
+        self.prevhash_be = b""
+        self.nbits_be = b""
+        self.ntime_be = b""
+        self.coinb1 = b""
+        self.coinb2 = b""
+        self.merkle_branch = []
+        # reusable 80-byte header; bytes 0..75 are fixed per job and the
+        # nonce is packed in place, so the scan allocates nothing
+        self._header_buf = bytearray(80)
+        self._header_view = memoryview(self._header_buf)
+        self.nonce_base = 0
+        # optional (client, clean_jobs) callback fired after each
+        # prepared mining.notify; runs on the reader thread, so async
+        # consumers must trampoline via call_soon_threadsafe
+        self.on_new_job = None
+
+    # ------------------------------------------------------------------
+    # Connection and framing
+    # ------------------------------------------------------------------
+
+    def connect(self):
+        self.sock = socket.create_connection((self.host, self.port),
+                                             timeout=30)
+        self._rx_buf.clear()
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def send_message(self, message):
+        self.message_id += 1
+        message["id"] = self.message_id
+        # write into the per-client scratch buffer rather than
+        # concatenating payload + newline into a fresh bytes object; one
+        # sendall, no short-lived allocations during submit bursts
+        payload = _dumps_bytes(message)
+        end = len(payload) + 1
+        if end > len(self._tx_buf):
+            self._tx_buf = bytearray(end)
+        self._tx_buf[:end - 1] = payload
+        self._tx_buf[end - 1] = 0x0A
+        self.sock.sendall(memoryview(self._tx_buf)[:end])
+        return self.message_id
+
+    def _read_line(self):
+        """Return one newline-terminated frame from the socket."""
+        while True:
+            idx = self._rx_buf.find(b"\n")
+            if idx >= 0:
+                line = bytes(self._rx_buf[:idx + 1])
+                del self._rx_buf[:idx + 1]
+                return line
+            chunk = self.sock.recv(4096)
+            if not chunk:
+                raise ConnectionError("pool closed the connection")
+            self._rx_buf += chunk
+
+    def receive_message(self):
+        """Read, validate and return one pool message."""
+        # the validator's JSON decoder takes bytes directly; no .decode()
+        return self.security_validator.validate_message(self._read_line())
+
+    # ------------------------------------------------------------------
+    # Background reader
+    # ------------------------------------------------------------------
+
+    def start_reader(self):
+        """Start the reader thread; call once after the handshake.
+
+        With the reader running, notifications are dispatched as they
+        arrive and :meth:`submit_share` returns a future instead of
+        blocking the hashing thread on the pool round-trip.
+        """
+        if self._reader_thread is not None:
+            return
+        self._reader_thread = threading.Thread(target=self._reader_loop,
+                                               daemon=True)
+        self._reader_thread.start()
+
+    def _reader_loop(self):
+        while True:
+            try:
+                message = self.receive_message()
+            except SecurityError:
+                continue
+            except (OSError, ConnectionError) as exc:
+                self._fail_pending(exc)
+                return
+            if "method" in message:
+                self.handle_notification(message)
+                continue
+            with self._pending_lock:
+                future = self._pending.pop(message.get("id"), None)
+            if future is not None:
+                future.set_result(message)
+
+    def _fail_pending(self, exc):
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_exception(exc)
+
+    def _send_tracked(self, message):
+        """Send a request and return a future for its response."""
+        future = Future()
+        # registering under the lock before the send returns guarantees
+        # the reader finds the entry even if the reply races the insert
+        with self._pending_lock:
+            self.send_message(message)
+            self._pending[self.message_id] = future
+        return future
+
+    # ------------------------------------------------------------------
+    # Protocol
+    # ------------------------------------------------------------------
+
+    def subscribe(self):
+        self.send_message({"method": "mining.subscribe",
+                           "params": ["ScryptMineOS/1.0"]})
+        response = self.receive_message()
+        result = response["result"]
+        self.extranonce_manager = ExtranonceManager(result[1], result[2])
+        return response
+
+    def authorize(self):
+        self.send_message({"method": "mining.authorize",
+                           "params": [self.username, self.password]})
+        return self.receive_message()
+
+    def subscribe_aux(self, coin, address="", worker=""):
+        """Register an aux chain (AuxPoW merged mining) on this session.
+
+        Merged pools embed the aux chain's hash in the coinbase they
+        hand out, so the same share credits every registered chain over
+        one socket.  The pool-side registration is best effort: pools
+        that merge implicitly (payout keyed off the login) reject or
+        ignore the method, and the local registration stands either
+        way.  Requires :meth:`start_reader`.
+        """
+        self.active_coins.append(coin)
+        try:
+            future = self._send_tracked(
+                {"method": "mining.aux.subscribe",
+                 "params": [coin, address, worker]})
+            return future.result(timeout=5)
+        except Exception:
+            return None
+
+    def handle_notification(self, message):
+        method = message.get("method")
+        if method == "mining.notify":
+            params = message["params"]
+            with self.job_lock:
+                self.current_job = params
+                self._prepare_job(params)
+            if self.on_new_job is not None:
+                clean = bool(params[8]) if len(params) > 8 else True
+                self.on_new_job(self, clean)
+        elif method == "mining.set_difficulty":
+            with self.job_lock:
+                self.difficulty_manager.update_difficulty(
+                    message["params"][0])
+
+    def _prepare_job(self, params):
+        """Precompute the per-job hashing state from a ``mining.notify``.
+
+        The first 64 header bytes are fixed for the whole nonce scan, so
+        the SHA-256 midstate after absorbing them is computed here once;
+        per nonce only the 16-byte tail transform and the inner hash
+        remain.  Caller holds ``job_lock``.
+        """
+        job_id, prevhash, coinb1, coinb2, branch, version, nbits, ntime = \
+            params[:8]
+        self.version_be = bytes.fromhex(version)[::-1]
+        # prevhash arrives pre-word-swapped: reverse bytes within each
+        # 32-bit word, keeping word order (a whole-buffer [::-1] builds
+        # a header no pool accepts)
+        self.prevhash_be = hashing.swap_prevhash_words(prevhash)
+        self.nbits_be = bytes.fromhex(nbits)[::-1]
+        self.ntime_be = bytes.fromhex(ntime)[::-1]
+        self.coinb1 = bytes.fromhex(coinb1)
+        self.coinb2 = bytes.fromhex(coinb2)
+        self.merkle_branch = [bytes.fromhex(h) for h in branch]
+
+        self.job_extranonce2 = self.extranonce_manager.generate_extranonce2()
+        coinbase = b"".join((
+            self.coinb1,
+            bytes.fromhex(self.extranonce_manager.extranonce1),
+            bytes.fromhex(self.job_extranonce2),
+            self.coinb2,
+        ))
+        merkle_root = hashing.fold_merkle_branch(hashing.sha256d(coinbase),
+                                                 self.merkle_branch)
+        prefix = b"".join((self.version_be, self.prevhash_be,
+                           merkle_root[:28]))
+        self.job_midstate = hashing.header_midstate(prefix)
+        # last 12 constant header bytes; the scan appends the 4-byte nonce
+        self.job_tail = b"".join((merkle_root[28:], self.ntime_be,
+                                  self.nbits_be))
+        self._header_buf[:64] = prefix
+        self._header_buf[64:76] = self.job_tail
+        self.nonce_base = 0
+
+    def candidate_headers(self, batch):
+        """``(batch, 80)`` uint8 array of headers for the next nonce window.
+
+        The 76 fixed bytes are broadcast row-wise and the nonce column is
+        written as one ``np.arange`` — structure-of-arrays, so the whole
+        window goes to the scan kernel as a single contiguous block with
+        no per-nonce Python work.  Advances ``nonce_base`` (mod 2**32).
+        """
+        headers = np.empty((batch, 80), dtype=np.uint8)
+        headers[:, :76] = np.frombuffer(self._header_buf, dtype=np.uint8,
+                                        count=76)
+        headers[:, 76:].view(np.uint32)[:, 0] = (
+            np.arange(batch, dtype=np.uint32) + np.uint32(self.nonce_base))
+        self.nonce_base = (self.nonce_base + batch) & 0xFFFFFFFF
+        return headers
+
+    def fill_header_nonce(self, nonce):
+        """Pack ``nonce`` into the job's header buffer and return a view.
+
+        The returned memoryview goes straight into the hashing extension
+        through the buffer protocol; nothing is allocated per nonce.
+        """
+        _NONCE_STRUCT.pack_into(self._header_buf, 76, nonce)
+        return self._header_view
+
+    def submit_share(self, job_id, extranonce2, ntime, nonce, wait=False):
+        """Submit a share; returns a future for the pool's response.
+
+        Requires :meth:`start_reader`.  The hashing thread keeps mining
+        while the acknowledgement is in flight; share statistics are
+        updated from the response callback.  ``wait=True`` blocks for
+        the response instead (30 s timeout) and returns it directly.
+        """
+        params = [self.username, job_id, extranonce2, ntime, nonce]
+        if not self.security_validator.validate_share_submission(params):
+            raise SecurityError("refusing to submit malformed share")
+        if job_id.isalnum() and self._username_template_safe:
+            future = Future()
+            with self._pending_lock:
+                self.message_id += 1
+                self._pending[self.message_id] = future
+                self.sock.sendall(_SUBMIT_TEMPLATE % (
+                    self.message_id, self._username_b,
+                    job_id.encode("ascii"), extranonce2.encode("ascii"),
+                    ntime.encode("ascii"), nonce.encode("ascii")))
+        else:
+            future = self._send_tracked({"method": "mining.submit",
+                                         "params": params})
+        future.add_done_callback(self._record_share_result)
+        if wait:
+            return future.result(timeout=30)
+        return future
+
+    def _record_share_result(self, future):
+        if future.exception() is not None:
+            return
+        if future.result().get("result"):
+            self.monitor.shares.add_accepted()
+        else:
+            self.monitor.shares.add_rejected()
+
+    def get_stats(self):
+        stats = self.monitor.get_stats()
+        stats["security"] = self.security_validator.get_security_stats()
+        stats["difficulty"] = self.difficulty_manager.difficulty
+        stats["active_coins"] = list(self.active_coins)
+        return stats
@@ -0,0 +1 @@
+"""Enterprise deployment support: secure configuration and access control."""
@@ -0,0 +1 @@
+"""Security components for enterprise deployments."""
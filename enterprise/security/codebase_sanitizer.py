@@ -0,0 +1,343 @@
+"""Sensitive-data scanner and redactor for the repository tree.
+
+Finds wallet addresses, credentials, API keys and connection strings in
+tracked text files and rewrites them to redaction markers — used before
+publishing a deployment tree or handing a copy to a collaborator.
+"""
+
+import fnmatch
+import mmap
+import os
+import re
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from enterprise.security import patterns
+
+# ripgrep, when installed, narrows the candidate set for a whole-tree
+# scan one to two orders of magnitude faster than the Python regex walk;
+# everything still works without it
+_RG = shutil.which("rg")
+
+# below this size a plain read-and-decode is cheaper than setting up a
+# mapping; above it, scanning the mmap as bytes skips the UTF-8 decode
+# and the full-file str allocation entirely
+_MMAP_MIN_SIZE = 64 * 1024
+
+# hard ceiling per file: a committed data dump with a whitelisted
+# extension should not turn the scan into an O(dump-size) stall.  Files
+# above it are skipped outright (the mmap path keeps memory flat below
+# it, so no chunking is needed in between).
+MAX_SCAN_BYTES = 16 * 1024 * 1024
+
+# leading bytes sniffed for NUL to weed out binaries that carry a text
+# extension; real text files essentially never contain NUL this early
+_SNIFF_BYTES = 2048
+
+
+class CodebaseSanitizer:
+    """Scans and rewrites sensitive values across a tree."""
+
+    #: category -> regex sources, shared with the access controller via
+    #: enterprise.security.patterns; every category has its own marker
+    #: so a sanitized file still shows what kind of value was removed
+    sensitive_patterns = patterns.SENSITIVE_SOURCES
+
+    #: cheap literal triggers checked with `in` (C-level memchr scan)
+    #: before any regex runs; text without any of them can't match the
+    #: credential/connection rules.  The base58 wallet rules have no
+    #: lowercase literal, so an uppercase "D" (their only fixed byte
+    #: besides "ltc1") is checked against the raw content separately.
+    #: A bare 64-hex key with no named context can slip past the
+    #: prefilter — accepted in exchange for skipping the regex on the
+    #: vast majority of files.
+    _trigger_tokens = ("password", "secret", "api", "mongodb", "ltc1",
+                       "key")
+
+    @classmethod
+    def _may_contain_sensitive(cls, content: str) -> bool:
+        lowered = content.lower()
+        return (any(token in lowered for token in cls._trigger_tokens)
+                or "D" in content)
+
+    #: every category fused into one unnamed alternation for in-memory
+    #: redaction: one compiled pattern, one scan over the string,
+    #: instead of a re.sub (and a pattern-cache lookup) per rule
+    _REDACT_RE = patterns.COMBINED_RE
+
+    replacements = {
+        "wallet": "[WALLET_REDACTED]",
+        "password": "password=[REDACTED]",
+        "api_key": "api_key=[REDACTED]",
+        "connection": "[CONNECTION_REDACTED]",
+        "hex_key": "[KEY_REDACTED]",
+    }
+
+    scan_extensions = (".py", ".md", ".txt", ".json", ".yaml", ".yml",
+                      ".toml", ".ini", ".cfg", ".env", ".sh")
+
+    exclude_patterns = ("__pycache__/*", ".git/*", "node_modules/*",
+                        "build/*", "*.pyc", "*.so")
+
+    def __init__(self, root: str = "."):
+        self.root = root
+        # Exclusions split by kind at construction: directory names go in
+        # a frozenset consulted while pruning the walk, file globs become
+        # one compiled alternation.  Path() + .match per (file, pattern)
+        # pair built a PurePath and re-translated the glob on every call.
+        self._exclude_dirs = frozenset(
+            p[:-2] for p in self.exclude_patterns if p.endswith("/*"))
+        file_globs = [p for p in self.exclude_patterns
+                      if not p.endswith("/*")]
+        self._exclude_file_re = re.compile(
+            "|".join(fnmatch.translate(p) for p in file_globs))
+        # One alternation over every category, one group per source
+        # pattern: scanning and rewriting both run a single compiled
+        # regex pass per file, and the hit's lastgroup names the
+        # category for the finding record and the replacement marker.
+        combined_source = "|".join(
+            "(?P<%s__%d>%s)" % (category, i, pattern)
+            for category, patterns in self.sensitive_patterns.items()
+            for i, pattern in enumerate(patterns))
+        self._combined = re.compile(combined_source, re.IGNORECASE)
+        # bytes twin of the combined pattern, run directly over an mmap
+        # when scanning large files; every rule is pure ASCII so the
+        # encoded source matches byte-for-byte what the str pattern
+        # matches on decoded text
+        self._combined_bytes = re.compile(
+            combined_source.encode("ascii"), re.IGNORECASE)
+        self._trigger_bytes = re.compile(
+            b"(?i:password|secret|api|mongodb|ltc1|key)|D")
+
+    # ------------------------------------------------------------------
+    # Tree walking
+    # ------------------------------------------------------------------
+
+    def _should_exclude(self, file_name: str) -> bool:
+        return self._exclude_file_re.match(file_name) is not None
+
+    def _eligible_files(self):
+        # explicit scandir stack: excluded directories are never pushed
+        # (so the walk never descends into them), and the DirEntry's
+        # cached stat supplies the size cap without a second syscall
+        exclude_dirs = self._exclude_dirs
+        stack = [self.root]
+        while stack:
+            try:
+                entries = os.scandir(stack.pop())
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    name = entry.name
+                    if entry.is_dir(follow_symlinks=False):
+                        if name not in exclude_dirs:
+                            stack.append(entry.path)
+                        continue
+                    if self._should_exclude(name):
+                        continue
+                    if not name.lower().endswith(self.scan_extensions):
+                        continue
+                    try:
+                        if entry.stat().st_size > MAX_SCAN_BYTES:
+                            continue
+                    except OSError:
+                        continue
+                    yield entry.path, os.path.relpath(entry.path,
+                                                      self.root)
+
+    # ------------------------------------------------------------------
+    # Scan / sanitize
+    # ------------------------------------------------------------------
+
+    def sanitize_file(self, path: str, rel: str,
+                      dry_run: bool = False) -> List[dict]:
+        """Scan and (unless ``dry_run``) rewrite one file in one pass.
+
+        The replacement callback records each finding while the single
+        ``subn`` traversal produces the rewritten text, so the file is
+        read exactly once and the regex runs exactly once — no separate
+        scan pass before the rewrite.
+        """
+        findings: List[dict] = []
+
+        def _redact(match):
+            category = match.lastgroup.split("__")[0]
+            findings.append({
+                "file": rel,
+                "category": category,
+                "offset": match.start(),
+            })
+            return self.replacements[category]
+
+        try:
+            with open(path, "rb") as fh:
+                # clean files are the overwhelming majority: for large
+                # ones, one bytes search over an mmap decides "no hit"
+                # without decoding anything, and the rewrite machinery
+                # below never runs
+                size = os.fstat(fh.fileno()).st_size
+                # enforced here, not only in the directory walk, so the
+                # ripgrep candidate path honors the cap too
+                if size > MAX_SCAN_BYTES:
+                    return findings
+                if size >= _MMAP_MIN_SIZE:
+                    with mmap.mmap(fh.fileno(), 0,
+                                   access=mmap.ACCESS_READ) as mm:
+                        if b"\x00" in mm[:_SNIFF_BYTES]:
+                            return findings
+                        if self._combined_bytes.search(mm) is None:
+                            return findings
+                raw = fh.read()
+                if b"\x00" in raw[:_SNIFF_BYTES]:
+                    return findings
+                content = raw.decode("utf-8", errors="ignore")
+        except (OSError, ValueError):
+            return findings
+        if not self._may_contain_sensitive(content):
+            return findings
+        sanitized, count = self._combined.subn(_redact, content)
+        if count and not dry_run:
+            # write-to-temp + os.replace: the rewrite lands atomically,
+            # so a crash mid-write can't leave a half-sanitized file
+            tmp_path = path + ".sanitize.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as fh:
+                fh.write(sanitized)
+            # keep the original permissions (e.g. the execute bit on a
+            # sanitized .sh); the fresh temp file has default mode
+            shutil.copymode(path, tmp_path)
+            os.replace(tmp_path, path)
+        return findings
+
+    def _scan_file(self, path: str, rel: str) -> List[dict]:
+        """Findings for one file, without ever producing a rewrite.
+
+        Large files are scanned through an mmap with the bytes twin of
+        the combined pattern — no str allocation, no UTF-8 decode, and
+        pages the regex never touches are never faulted in.  Small
+        files go through the ordinary read path where mapping overhead
+        would dominate.
+        """
+        try:
+            size = os.path.getsize(path)
+            if size > MAX_SCAN_BYTES:  # rg candidates skip the walk's cap
+                return []
+            if size < _MMAP_MIN_SIZE:
+                return self.sanitize_file(path, rel, dry_run=True)
+            with open(path, "rb") as fh, \
+                    mmap.mmap(fh.fileno(), 0,
+                              access=mmap.ACCESS_READ) as mm:
+                if b"\x00" in mm[:_SNIFF_BYTES]:
+                    return []
+                if self._trigger_bytes.search(mm) is None:
+                    return []
+                return [{
+                    "file": rel,
+                    "category": match.lastgroup.split("__")[0],
+                    "offset": match.start(),
+                } for match in self._combined_bytes.finditer(mm)]
+        except (OSError, ValueError):
+            return []
+
+    def _rg_candidate_files(self) -> Optional[List[Tuple[str, str]]]:
+        """Files ripgrep says contain at least one hit, or None.
+
+        ``rg -l`` does the tree walk and the multi-pattern search in
+        native code; the per-file Python pass then runs only on the
+        survivors, which keeps category attribution exact (rg match
+        events don't say which rule fired).  Returns None when rg is
+        missing or errors (e.g. a PCRE2-less build rejecting the
+        lookarounds), in which case the caller walks everything itself.
+        """
+        if _RG is None:
+            return None
+        args = [_RG, "-l", "-i", "-P", "--hidden", "--no-ignore",
+                "--no-messages"]
+        for directory in sorted(self._exclude_dirs):
+            args += ["-g", "!%s/" % directory]
+        for pattern in self.exclude_patterns:
+            if not pattern.endswith("/*"):
+                args += ["-g", "!%s" % pattern]
+        args += ["-g", "*{%s}" % ",".join(self.scan_extensions)]
+        for patterns in self.sensitive_patterns.values():
+            for pattern in patterns:
+                args += ["-e", pattern]
+        args.append(self.root)
+        try:
+            result = subprocess.run(args, capture_output=True, text=True,
+                                    timeout=300)
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+        if result.returncode not in (0, 1):  # 1 means "no matches"
+            return None
+        return [(line, os.path.relpath(line, self.root))
+                for line in result.stdout.splitlines() if line]
+
+    def scan_codebase(self) -> List[dict]:
+        """Findings only; never rewrites."""
+        candidates = self._rg_candidate_files()
+        if candidates is None:
+            candidates = self._eligible_files()
+        findings = []
+        for path, rel in candidates:
+            findings.extend(self._scan_file(path, rel))
+        return findings
+
+    def sanitize_codebase(self, dry_run: bool = False,
+                          workers: Optional[int] = None) -> Dict[str, int]:
+        """Scan and rewrite the whole tree.
+
+        The regex pass is CPU-bound pure Python and each file is
+        independent, so the work fans out over a process pool (threads
+        would serialize on the GIL).  ``workers=1`` keeps everything in
+        this process, e.g. under a debugger.
+        """
+        candidates = self._rg_candidate_files()
+        if candidates is None:
+            candidates = self._eligible_files()
+        tasks = [(path, rel, dry_run) for path, rel in candidates]
+        files_scanned = len(tasks)
+        findings = []
+        if workers == 1 or len(tasks) < 64:
+            for task in tasks:
+                findings.extend(_sanitize_one(task))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for file_findings in pool.map(_sanitize_one, tasks,
+                                              chunksize=32):
+                    findings.extend(file_findings)
+        by_category: Dict[str, int] = {}
+        for finding in findings:
+            category = finding["category"]
+            by_category[category] = by_category.get(category, 0) + 1
+        return {
+            "files_scanned": files_scanned,
+            "findings": len(findings),
+            "by_category": by_category,
+        }
+
+    # ------------------------------------------------------------------
+    # In-memory redaction
+    # ------------------------------------------------------------------
+
+    def hide_sensitive_content(self, content: str) -> str:
+        """Redact sensitive values from a string (e.g. log output)."""
+        if not self._may_contain_sensitive(content):
+            return content
+        return self._REDACT_RE.sub("[REDACTED]", content)
+
+
+# Per-worker sanitizer for the process pool: built (and its combined
+# regex compiled) once in each worker on first use, then reused for
+# every chunk that worker receives.
+_WORKER_SANITIZER: Optional[CodebaseSanitizer] = None
+
+
+def _sanitize_one(task: Tuple[str, str, bool]) -> List[dict]:
+    global _WORKER_SANITIZER
+    if _WORKER_SANITIZER is None:
+        _WORKER_SANITIZER = CodebaseSanitizer()
+    path, rel, dry_run = task
+    return _WORKER_SANITIZER.sanitize_file(path, rel, dry_run)
@@ -0,0 +1,301 @@
+"""Encrypted configuration store with per-user access control.
+
+Enterprise deployments keep wallet addresses, pool credentials and
+operator settings here instead of in plain-text config files.  Values
+marked sensitive are encrypted at rest; every read and write is access
+checked against the requesting user's level and recorded in the audit
+log.
+"""
+
+import base64
+import itertools
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from enum import IntEnum
+from types import MappingProxyType
+from typing import Any, Dict, List, Optional, Tuple
+
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+
+_PBKDF2_ITERATIONS = 100_000
+_DEFAULT_SALT = b"scryptmineos-enterprise"
+
+# audit trail ring size; old entries roll off instead of growing the
+# process without bound on a long-running deployment
+_AUDIT_MAXLEN = 100_000
+
+# Every supported payout-address shape in one alternation, compiled at
+# import: bulk user import validates each address with a single DFA pass
+# instead of a chain of per-coin startswith/length checks.
+_WALLET_ADDRESS = re.compile(
+    r"^(?:"
+    r"D[1-9A-HJ-NP-Za-km-z]{25,33}"       # dogecoin base58
+    r"|[LM][1-9A-HJ-NP-Za-km-z]{26,33}"   # litecoin legacy / p2sh
+    r"|ltc1[02-9ac-hj-np-z]{8,87}"        # litecoin bech32
+    r")$")
+
+# PBKDF2 at 100k iterations costs tens of milliseconds by design.  The
+# derivation is pure in (password, salt), so derive once and share the
+# result across every manager constructed in the process.
+_DERIVED_KEY_CACHE: Dict[Tuple[bytes, bytes], bytes] = {}
+
+
+def _derive_key(password: bytes, salt: bytes) -> bytes:
+    key = _DERIVED_KEY_CACHE.get((password, salt))
+    if key is None:
+        kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=salt,
+                         iterations=_PBKDF2_ITERATIONS)
+        key = kdf.derive(password)
+        _DERIVED_KEY_CACHE[(password, salt)] = key
+    return key
+
+
+class AccessLevel(IntEnum):
+    """Ordered privilege levels; access checks are plain comparisons."""
+
+    PUBLIC = 0
+    USER = 1
+    COLLABORATOR = 2
+    CREATOR = 3
+    SYSTEM = 3  # alias of CREATOR, kept for call sites that name it
+
+
+class AccessDeniedError(Exception):
+    """Raised when a user requests a config item above their level."""
+
+
+# slots=True drops the per-instance __dict__ (~100 bytes per object and
+# a dict lookup per attribute access); with thousands of config items
+# and users the dicts dominate memory.  The keyword landed in 3.10.
+_SLOTS_KW = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+
+@dataclass(**_SLOTS_KW)
+class ConfigItem:
+    key: str
+    value: Any
+    access_level: AccessLevel = AccessLevel.USER
+    encrypted: bool = False
+    description: str = ""
+
+
+@dataclass(**_SLOTS_KW)
+class UserProfile:
+    user_id: str
+    access_level: AccessLevel = AccessLevel.USER
+    wallet_address: str = ""
+
+
+class SecureConfigManager:
+    """Holds the config items, user profiles and the audit trail."""
+
+    def __init__(self, master_password: Optional[str] = None,
+                 salt: bytes = _DEFAULT_SALT):
+        self._master_password = master_password
+        self._salt = salt
+        self._cipher = AESGCM(self._get_or_create_encryption_key())
+        self._configs: Dict[str, ConfigItem] = {}
+        self.users: Dict[str, UserProfile] = {}
+        # bumped on any user-table change; consumers key caches on it
+        self.users_version = 0
+        self.audit_log: deque = deque(maxlen=_AUDIT_MAXLEN)
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Key handling
+    # ------------------------------------------------------------------
+
+    def _get_or_create_encryption_key(self) -> bytes:
+        env_key = os.getenv("ENTERPRISE_ENCRYPTION_KEY")
+        if env_key:
+            return base64.urlsafe_b64decode(env_key)
+        password = (self._master_password
+                    or os.getenv("ENTERPRISE_MASTER_PASSWORD")
+                    or "scryptmineos-default")
+        return _derive_key(password.encode("utf-8"), self._salt)
+
+    def _encrypt_if_needed(self, item: ConfigItem) -> Any:
+        if not item.encrypted:
+            return item.value
+        # AES-GCM, stored raw as nonce(12)||ciphertext||tag: one AES-NI
+        # + CLMUL pass and no base64, where Fernet ran CBC plus a
+        # separate HMAC-SHA256 over base64-wrapped output
+        nonce = os.urandom(12)
+        ciphertext = self._cipher.encrypt(
+            nonce, str(item.value).encode("utf-8"), None)
+        return nonce + ciphertext
+
+    def _decrypt_if_needed(self, item: ConfigItem, stored: Any) -> Any:
+        if not item.encrypted:
+            return stored
+        return self._cipher.decrypt(
+            stored[:12], stored[12:], None).decode("utf-8")
+
+    # ------------------------------------------------------------------
+    # Access control
+    # ------------------------------------------------------------------
+
+    def _check_access(self, user_id: str,
+                      required_level: AccessLevel) -> bool:
+        # deliberately uncached: since AccessLevel became an IntEnum the
+        # check is one dict hit plus an integer comparison, cheaper than
+        # an lru_cache lookup would be — and a cache would need explicit
+        # invalidation whenever a profile's level changes
+        user = self.users.get(user_id)
+        return user is not None and user.access_level >= required_level
+
+    def _audit(self, user_id: str, action: str, key: str, allowed: bool):
+        # raw clock sample; ISO formatting costs a datetime object and a
+        # string per event and only matters on export
+        self.audit_log.append({
+            "timestamp": time.time_ns(),
+            "user_id": user_id,
+            "action": action,
+            "key": key,
+            "allowed": allowed,
+        })
+
+    def _audit_many(self, entries: List[dict]):
+        """Append pre-timestamped entries in one locked extend.
+
+        Bulk producers (e.g. a listing that denies thousands of paths)
+        pay one lock acquisition for the batch instead of one per
+        entry.
+        """
+        with self._lock:
+            self.audit_log.extend(entries)
+
+    def get_audit_log(self, limit: int = 100) -> List[dict]:
+        """Most recent audit entries, newest first.
+
+        Walks the ring from the right, so the cost scales with ``limit``
+        rather than the full trail.
+        """
+        with self._lock:
+            entries = list(itertools.islice(reversed(self.audit_log),
+                                            limit))
+        # format timestamps only for the records actually exported,
+        # without mutating the stored entries
+        return [dict(entry, timestamp=datetime.fromtimestamp(
+                    entry["timestamp"] / 1e9, tz=timezone.utc).isoformat())
+                for entry in entries]
+
+    # ------------------------------------------------------------------
+    # Users
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _validate_wallet_address(address: str) -> bool:
+        # empty is fine: the wallet is optional on a profile
+        return not address or _WALLET_ADDRESS.match(address) is not None
+
+    def add_user(self, user_id: str,
+                 access_level: AccessLevel = AccessLevel.USER,
+                 wallet_address: str = ""):
+        if not self._validate_wallet_address(wallet_address):
+            raise ValueError("malformed wallet address for %r" % user_id)
+        with self._lock:
+            self.users[user_id] = UserProfile(user_id, access_level,
+                                              wallet_address)
+            self.users_version += 1
+
+    def get_user_wallet(self, user_id: str, requesting_user: str) -> str:
+        with self._lock:
+            allowed = (requesting_user == user_id
+                       or self._check_access(requesting_user,
+                                             AccessLevel.CREATOR))
+            self._audit(requesting_user, "get_wallet", user_id, allowed)
+            if not allowed:
+                raise AccessDeniedError(
+                    "user %r may not read %r's wallet"
+                    % (requesting_user, user_id))
+            user = self.users.get(user_id)
+            return user.wallet_address if user else ""
+
+    # ------------------------------------------------------------------
+    # Config items
+    # ------------------------------------------------------------------
+
+    def set_config(self, user_id: str, key: str, value: Any,
+                   access_level: AccessLevel = AccessLevel.USER,
+                   encrypted: bool = False, description: str = ""):
+        with self._lock:
+            allowed = self._check_access(user_id, AccessLevel.COLLABORATOR)
+            self._audit(user_id, "set_config", key, allowed)
+            if not allowed:
+                raise AccessDeniedError(
+                    "user %r may not write config" % user_id)
+            item = ConfigItem(key, value, access_level, encrypted,
+                              description)
+            item.value = self._encrypt_if_needed(item)
+            self._configs[key] = item
+
+    def get_config(self, user_id: str, key: str,
+                   default: Any = None) -> Any:
+        with self._lock:
+            item = self._configs.get(key)
+            if item is None:
+                return default
+            allowed = self._check_access(user_id, item.access_level)
+            self._audit(user_id, "get_config", key, allowed)
+            if not allowed:
+                raise AccessDeniedError(
+                    "user %r may not read %r" % (user_id, key))
+            return self._decrypt_if_needed(item, item.value)
+
+    def snapshot_for(self, user_id: str) -> MappingProxyType:
+        """Read-only snapshot of the user's effective configuration.
+
+        One locked pass and one audit entry cover every key the user
+        may read; callers doing many lookups at startup read from the
+        proxy instead of paying an access check per key.  The proxy
+        reflects the moment it was taken — retake it after config
+        changes.
+        """
+        return MappingProxyType(self.export_user_config(user_id))
+
+    def export_user_config(self, user_id: str) -> Dict[str, Any]:
+        """Every config value ``user_id`` may read, decrypted.
+
+        Runs the whole export against the manager's one shared AEAD
+        context — per item only the AES-GCM operation itself, no cipher
+        construction — and audits once for the batch rather than per
+        key.
+        """
+        with self._lock:
+            allowed = user_id in self.users
+            self._audit(user_id, "export_config", "*", allowed)
+            if not allowed:
+                raise AccessDeniedError("unknown user %r" % user_id)
+            return {
+                key: self._decrypt_if_needed(item, item.value)
+                for key, item in self._configs.items()
+                if self._check_access(user_id, item.access_level)
+            }
+
+
+# Process-wide manager shared by callers that don't construct their own.
+_MANAGER: Optional[SecureConfigManager] = None
+
+
+def init_config_manager(master_password: Optional[str] = None,
+                        salt: bytes = _DEFAULT_SALT) -> SecureConfigManager:
+    """(Re)create the shared manager, e.g. after rotating the password."""
+    global _MANAGER
+    _MANAGER = SecureConfigManager(master_password, salt)
+    return _MANAGER
+
+
+def get_config_manager() -> SecureConfigManager:
+    global _MANAGER
+    if _MANAGER is None:
+        _MANAGER = SecureConfigManager()
+    return _MANAGER
@@ -0,0 +1,337 @@
+"""Per-user file access control for enterprise deployments.
+
+Decides which repository files a user may see or touch, based on their
+:class:`~enterprise.security.config_manager.AccessLevel` and the glob
+pattern sets below.  Creator-only patterns cover secrets and wallet
+material; user patterns carve out each user's own config area.  Denials
+of protected paths are recorded in the config manager's audit trail.
+"""
+
+import contextlib
+import fnmatch
+import functools
+import os
+import re
+import time
+from typing import Dict, List, Optional
+
+from enterprise.security import patterns
+from enterprise.security.config_manager import (AccessLevel,
+                                                SecureConfigManager,
+                                                get_config_manager)
+
+
+@functools.cache
+def _translate_one(pattern: str) -> str:
+    """fnmatch.translate memoized module-wide.
+
+    fnmatch's internal cache tops out at ~256 entries and is shared
+    with every other caller in the process; with per-user templated
+    patterns it thrashes.  The pattern vocabulary here is small and
+    static, so an unbounded cache is fine.
+    """
+    return fnmatch.translate(pattern)
+
+
+@functools.lru_cache(maxsize=4096)
+def _user_pattern_re(patterns: tuple, user_id: str):
+    """Compiled patterns for one user's own config area.
+
+    Module-level on purpose: an lru_cache on a method would pin the
+    controller alive through the cached ``self``.  Keyed on the (tuple)
+    pattern set plus the user id, so each user's specialized regex
+    compiles once and the cache bounds total compiled patterns even
+    with thousands of users.
+    """
+    return re.compile("|".join(
+        "(?:%s)" % _translate_one(pattern.format(user_id=user_id))
+        for pattern in patterns))
+
+
+@functools.cache
+def _compress_patterns(patterns):
+    """Drop duplicate and trivially dominated globs from a pattern set.
+
+    A literal pattern already matched by another glob in the set (e.g.
+    ``.env`` under ``*.env``, or anything under a bare ``*``) adds an
+    alternation branch without changing what the set matches.  Only
+    the safe cases are compressed — a literal covered by a sibling
+    glob, or any pattern next to ``*`` — since full glob-subsumption
+    is not decidable by fnmatch alone.
+    """
+    deduped = tuple(dict.fromkeys(patterns))
+    kept = []
+    for pattern in deduped:
+        if "*" in deduped and pattern != "*":
+            continue
+        literal = not any(ch in pattern for ch in "*?[")
+        if literal and any(other != pattern
+                           and fnmatch.fnmatchcase(pattern, other)
+                           for other in deduped):
+            continue
+        kept.append(pattern)
+    return tuple(kept)
+
+
+@functools.cache
+def _combine_source(patterns):
+    """Translate a glob list into one alternation regex source.
+
+    fnmatch.fnmatch per (path, pattern) pair pays a translate-cache
+    lookup and a separate match per pattern; a single combined pattern
+    matches the whole set in one pass.  Cached on the (tuple) pattern
+    set, so every controller built over the same class constants reuses
+    the translation.
+    """
+    return "|".join("(?:%s)" % _translate_one(p) for p in patterns)
+
+
+class FileAccessController:
+    """Maps (user, path, operation) to an allow/deny decision."""
+
+    creator_only_patterns = (
+        ".env",
+        ".env.*",
+        "secrets/*",
+        "*.secret",
+        "*.key",
+        "*.pem",
+        "wallet.dat",
+        "config/private/*",
+    )
+    collaborator_patterns = (
+        "config/*",
+        "scripts/*",
+        "kernels/*",
+        "*.toml",
+        "*.ini",
+    )
+    user_modifiable_patterns = (
+        "user_configs/{user_id}/*",
+        "profiles/{user_id}.json",
+    )
+
+    def __init__(self, root: str = ".",
+                 config_manager: Optional[SecureConfigManager] = None):
+        self.root = root
+        self.config_manager = config_manager or get_config_manager()
+        # Pattern sets are class constants, so every set compiles here
+        # and never again.  All of them are fused into ONE alternation
+        # with a named group per category: classifying a path is a
+        # single C-level match instead of one regex (or fnmatch list)
+        # per set.  Order matters — creator/sensitive outrank the user
+        # carve-outs, mirroring the decision precedence.  The {user_id}
+        # templates embed a capture per slot so one compiled regex
+        # serves every user; the matched slot is compared to the caller.
+        # compress each set first: duplicates and trivially dominated
+        # globs only widen the alternation the regex engine has to try
+        creator_patterns = _compress_patterns(self.creator_only_patterns)
+        collab_patterns = _compress_patterns(self.collaborator_patterns)
+        user_patterns = _compress_patterns(self.user_modifiable_patterns)
+        user_parts = []
+        for i, pattern in enumerate(user_patterns):
+            translated = _translate_one(
+                pattern.format(user_id="\x00uid\x00"))
+            user_parts.append("(?:%s)" % translated.replace(
+                re.escape("\x00uid\x00"), r"(?P<uid%d>[^/]+)" % i))
+        # sensitive-path group derived from the shared literals, so it
+        # can't drift from _is_sensitive_file or the sanitizer's rules
+        sensitive = "(?i:%s)" % "|".join(
+            [".*" + re.escape(ext) + r"\Z"
+             for ext in patterns.SENSITIVE_FILE_EXTS]
+            + [".*(?:%s)" % "|".join(patterns.SENSITIVE_FILE_NAMES)])
+        self._combined_re = re.compile(
+            "(?P<creator>%s)|(?P<sensitive>%s)|(?P<user>%s)|(?P<collab>%s)"
+            % (_combine_source(creator_patterns), sensitive,
+               "|".join(user_parts),
+               _combine_source(collab_patterns)))
+        # Decision memo, positive and negative results alike (most paths
+        # are denied for non-creators, so negatives dominate the hit
+        # rate).  The user-table version in the key invalidates every
+        # entry whenever a profile changes; a repeated denial of the
+        # same tuple is audited once per cache generation.
+        self._cached_decide = functools.lru_cache(maxsize=16384)(
+            self._resolve_and_decide)
+        # creator/known-user frozensets, rebuilt lazily whenever the
+        # user-table version moves: the single-operator deployment makes
+        # "creator touches thousands of files" the common case, and a
+        # frozenset hit answers it before any regex or cache machinery
+        self._creator_ids: frozenset = frozenset()
+        self._known_users: frozenset = frozenset()
+        self._user_sets_version = -1
+        # when set, denial audits collect here and land in one batch at
+        # the end of the enclosing listing instead of one append (and
+        # one lock acquisition) per denied file
+        self._audit_buffer: Optional[list] = None
+
+    # ------------------------------------------------------------------
+    # Decisions
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _normalize(file_path: str) -> str:
+        rel = os.path.normpath(file_path).replace(os.sep, "/")
+        return rel[2:] if rel.startswith("./") else rel
+
+    def _refresh_user_sets(self) -> int:
+        version = self.config_manager.users_version
+        if version != self._user_sets_version:
+            users = self.config_manager.users
+            self._creator_ids = frozenset(
+                uid for uid, profile in users.items()
+                if profile.access_level >= AccessLevel.CREATOR)
+            self._known_users = frozenset(users)
+            self._user_sets_version = version
+        return version
+
+    def can_access_file(self, user_id: str, file_path: str,
+                        operation: str = "read") -> bool:
+        version = self._refresh_user_sets()
+        # creators pass every branch of _decide, and unknown users fail
+        # all of them — both answered here with one frozenset hit
+        if user_id in self._creator_ids:
+            return True
+        if user_id not in self._known_users:
+            return False
+        return self._cached_decide(user_id, self._normalize(file_path),
+                                   operation, version)
+
+    def _resolve_and_decide(self, user_id: str, rel: str, operation: str,
+                            _version: int) -> bool:
+        users = self.config_manager.users
+        if user_id not in users:
+            return False
+        return self._decide(user_id, users[user_id].access_level, rel,
+                            operation)
+
+    def _decide(self, user_id: str, level: AccessLevel, rel: str,
+                operation: str) -> bool:
+        """Decision core over a normalized path; one combined match."""
+        match = self._combined_re.match(rel)
+        if match is None:
+            return operation == "read" or level >= AccessLevel.COLLABORATOR
+
+        if (match.group("creator") is not None
+                or match.group("sensitive") is not None):
+            allowed = level >= AccessLevel.CREATOR
+            if not allowed:
+                self._audit_denial(user_id, operation, rel)
+            return allowed
+
+        if match.group("user") is not None:
+            if level >= AccessLevel.COLLABORATOR:
+                return True
+            # ownership check against the caller's own cached regex
+            # instead of digging the matched uid out of groupdict
+            return _user_pattern_re(self.user_modifiable_patterns,
+                                    user_id).match(rel) is not None
+
+        # collaborator patterns and everything else: readable by any
+        # known user, writable from COLLABORATOR up
+        return operation == "read" or level >= AccessLevel.COLLABORATOR
+
+    def _audit_denial(self, user_id: str, operation: str, rel: str):
+        if self._audit_buffer is not None:
+            self._audit_buffer.append({
+                "timestamp": time.time_ns(),
+                "user_id": user_id,
+                "action": "denied_" + operation,
+                "key": rel,
+                "allowed": False,
+            })
+        else:
+            self.config_manager._audit(user_id, "denied_" + operation,
+                                       rel, False)
+
+    @contextlib.contextmanager
+    def _batched_audit(self):
+        """Collect denial audits and flush them as one batch on exit."""
+        if self._audit_buffer is not None:
+            yield  # already inside a batch; let the outermost one flush
+            return
+        self._audit_buffer = []
+        try:
+            yield
+        finally:
+            buffered, self._audit_buffer = self._audit_buffer, None
+            if buffered:
+                self.config_manager._audit_many(buffered)
+
+    def get_file_permissions(self, user_id: str,
+                             file_path: str) -> Dict[str, bool]:
+        return {
+            operation: self.can_access_file(user_id, file_path, operation)
+            for operation in ("read", "write", "delete", "share")
+        }
+
+    # single fused alternation over the shared path literals: the regex
+    # engine finds any of them in one left-to-right pass over the path.
+    # (An Aho-Corasick automaton would guarantee the same single pass,
+    # but nine literals don't warrant the extra dependency.)
+    _sensitive_re = patterns.SENSITIVE_FILE_RE
+
+    def _is_sensitive_file(self, file_path: str) -> bool:
+        return self._sensitive_re.search(file_path.lower()) is not None
+
+    # ------------------------------------------------------------------
+    # Listings
+    # ------------------------------------------------------------------
+
+    def get_accessible_files(self, user_id: str,
+                             subdir: str = "") -> List[str]:
+        """Relative paths under ``subdir`` the user may read."""
+        # user table hit and level resolution happen once out here; the
+        # per-file work is one _decide call on the combined regex
+        user = self.config_manager.users.get(user_id)
+        if user is None:
+            return []
+        level = user.access_level
+        accessible = []
+        base = os.path.join(self.root, subdir) if subdir else self.root
+        with self._batched_audit():
+            for root, _dirs, files in os.walk(base):
+                for name in files:
+                    rel = self._normalize(os.path.relpath(
+                        os.path.join(root, name), self.root))
+                    if self._decide(user_id, level, rel, "read"):
+                        accessible.append(rel)
+        return accessible
+
+    def secure_file_listing(self, user_id: str,
+                            subdir: str = "") -> List[dict]:
+        """Readable files with size and writability for the UI."""
+        user = self.config_manager.users.get(user_id)
+        if user is None:
+            return []
+        level = user.access_level
+        listing = []
+        base = os.path.join(self.root, subdir) if subdir else self.root
+        # explicit scandir stack instead of os.walk + getsize + exists:
+        # scandir has already proved the entry exists, and entry.stat()
+        # reuses the data the directory scan fetched — one stat-class
+        # syscall per file instead of three
+        stack = [base]
+        with self._batched_audit():
+            while stack:
+                try:
+                    entries = os.scandir(stack.pop())
+                except OSError:
+                    continue
+                with entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                            continue
+                        if not entry.is_file(follow_symlinks=False):
+                            continue
+                        rel = self._normalize(
+                            os.path.relpath(entry.path, self.root))
+                        if not self._decide(user_id, level, rel, "read"):
+                            continue
+                        listing.append({
+                            "path": rel,
+                            "size": entry.stat().st_size,
+                            "writable": self._decide(user_id, level, rel,
+                                                     "write"),
+                        })
+        return listing
@@ -0,0 +1,62 @@
+"""Shared sensitive-data patterns for the enterprise security modules.
+
+Single source of truth for what counts as sensitive, compiled once at
+import.  :mod:`~enterprise.security.codebase_sanitizer` and
+:mod:`~enterprise.security.file_access_control` both build on these, so
+the redaction rules and the access-control classification can't drift
+apart — and the process holds one compiled copy of each pattern instead
+of one per module.
+
+Treat every name here as frozen; derive, don't mutate.
+"""
+
+import re
+
+# ---------------------------------------------------------------------
+# Content rules: category -> regex sources over file/text content
+# ---------------------------------------------------------------------
+
+SENSITIVE_SOURCES = {
+    "wallet": (
+        r"ltc1q[a-zA-Z0-9]{38,}",
+        r"\bD[1-9A-HJ-NP-Za-km-z]{25,33}\b",
+    ),
+    "password": (
+        r"password[\"\s]*[:=][\"\s]*[^\"\s]+",
+        r"secret[\"\s]*[:=][\"\s]*[^\"\s]+",
+    ),
+    "api_key": (
+        r"api[_-]?key[\"\s]*[:=][\"\s]*[A-Za-z0-9]{16,}",
+    ),
+    "connection": (
+        r"mongodb(?:\+srv)?://[^\s\"']+",
+    ),
+    # exactly 64 hex chars not embedded in a longer run: raw private
+    # keys and similar material.  The lookarounds anchor both ends, so
+    # the engine can't backtrack through long hex-like blobs the way an
+    # unanchored {32,} rule would.
+    "hex_key": (
+        r"(?<![A-Za-z0-9])[A-Fa-f0-9]{64}(?![A-Za-z0-9])",
+    ),
+}
+
+#: every category fused into one unnamed alternation: one compiled
+#: pattern, one scan, for callers that only need "redact anything"
+COMBINED_RE = re.compile(
+    "|".join(source for sources in SENSITIVE_SOURCES.values()
+             for source in sources),
+    re.IGNORECASE)
+
+# ---------------------------------------------------------------------
+# Path rules: literals that mark a file itself as sensitive
+# ---------------------------------------------------------------------
+
+SENSITIVE_FILE_EXTS = (".key", ".pem", ".secret", ".env")
+SENSITIVE_FILE_NAMES = ("password", "secret", "credential", "private",
+                        "wallet")
+
+#: all path literals fused into one alternation (extensions
+#: end-anchored); match against a lowercased path
+SENSITIVE_FILE_RE = re.compile(
+    "|".join([re.escape(ext) + r"\Z" for ext in SENSITIVE_FILE_EXTS]
+             + [re.escape(name) for name in SENSITIVE_FILE_NAMES]))
@@ -0,0 +1,586 @@
+"""Enterprise mining orchestrator.
+
+Drives merged LTC+DOGE mining end to end: per-coin Stratum sessions,
+the (emulated) ASIC hardware, Prometheus metrics, periodic telemetry
+and an economic watchdog, all on one asyncio loop.  Configuration and
+credentials come from the enterprise config manager, gated by the
+operator's access level.
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from typing import Dict, List, Optional
+
+from prometheus_client import (Counter, Gauge, make_asgi_app,
+                               start_http_server)
+
+try:  # metrics persistence is optional; the runner works without it
+    from motor.motor_asyncio import AsyncIOMotorClient
+except ImportError:
+    AsyncIOMotorClient = None
+
+try:  # preferred exporter; without it metrics fall back to the
+    import uvicorn  # threaded prometheus_client HTTP server
+except ImportError:
+    uvicorn = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:  # faster loop for the socket-heavy mining/stratum traffic;
+    import uvloop  # stdlib selector loop works fine without it
+except ImportError:
+    uvloop = None
+
+# same guarded arrangement as enhanced_stratum_client: orjson when
+# available, compact stdlib encoding otherwise
+if orjson is not None:
+    _dumps_bytes = orjson.dumps
+else:
+    def _dumps_bytes(obj):
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+from asic_hardware_emulation import (ASICHardwareEmulator,
+                                     autotune_mine_work)
+from enhanced_stratum_client import EnhancedStratumClient
+from enterprise.security.config_manager import (AccessLevel,
+                                                get_config_manager)
+
+logger = logging.getLogger("enterprise_runner")
+
+MINING_OPERATIONS = Counter(
+    "mining_operations_total",
+    "Mining lifecycle and share events",
+    ["operation", "status"])
+HASHRATE_GAUGE = Gauge("mining_hashrate_hps",
+                       "Aggregate hashrate in hashes per second")
+POWER_GAUGE = Gauge("mining_power_watts", "Total board power draw")
+TEMPERATURE_GAUGE = Gauge("mining_temperature_celsius",
+                          "Hottest die temperature")
+METRIC_BATCHES_DROPPED = Counter(
+    "metric_batches_dropped_total",
+    "Telemetry batches lost because the storage backend rejected them")
+
+# Child metrics bound once at import: .labels() hashes the label tuple
+# and hits a dict on every call, which is pure overhead on the share
+# path where the (operation, status) pairs are a small fixed set.
+_M_INIT_OK = MINING_OPERATIONS.labels("initialize", "success")
+_M_INIT_ERR = MINING_OPERATIONS.labels("initialize", "error")
+_M_START_OK = MINING_OPERATIONS.labels("start", "success")
+_M_SHARE_OK = MINING_OPERATIONS.labels("share_submit", "accepted")
+_M_SHARE_REJ = MINING_OPERATIONS.labels("share_submit", "rejected")
+_M_LOOP_ERR = MINING_OPERATIONS.labels("mining_loop", "error")
+_M_STOP_OK = MINING_OPERATIONS.labels("stop", "success")
+
+
+class TelemetryBuffer:
+    """Batches telemetry records before they reach the storage backend.
+
+    Producers call :meth:`add`; records drain to the flush callable in
+    batches when either the size threshold is reached or the interval
+    timer fires, so the backend sees one write per batch instead of one
+    per monitoring tick.
+    """
+
+    def __init__(self, flush, max_batch_size: int = 100,
+                 flush_interval: float = 5.0,
+                 max_pending: int = 10_000):
+        self._flush = flush  # async callable receiving a list
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        # bound on buffered records while the backend is unreachable;
+        # beyond it new records are counted and dropped rather than
+        # growing the process without limit
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._buffer: deque = deque()
+
+    def add(self, record: Dict):
+        if len(self._buffer) >= self.max_pending:
+            self.dropped += 1
+            return
+        self._buffer.append(record)
+        if len(self._buffer) >= self.max_batch_size:
+            asyncio.get_running_loop().create_task(self.flush())
+
+    async def flush(self):
+        if not self._buffer:
+            return
+        batch = list(self._buffer)
+        self._buffer.clear()
+        await self._flush(batch)
+
+    async def run(self):
+        """Background drain; cancel and then :meth:`flush` to shut down."""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+
+class EnterpriseMiningSystem:
+    """Owns the clients, the hardware and the background loops."""
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.config_manager = get_config_manager()
+        self.hardware_emulator = ASICHardwareEmulator()
+        self.stratum_clients: Dict[str, EnhancedStratumClient] = {}
+        # per-coin push queues fed from mining.notify: the miner wakes
+        # the instant work arrives instead of polling for it
+        self.work_queues: Dict[str, asyncio.Queue] = {}
+        # structured supervision: every loop lives in one TaskGroup, so
+        # an unexpected failure in any of them cancels the siblings
+        # instead of leaving half the system silently dead
+        self._task_group: Optional[asyncio.TaskGroup] = None
+        self._loop_tasks: list = []
+        self.running = False
+        # set by stop_mining; whoever keeps the process alive awaits
+        # this instead of polling self.running
+        self.shutdown_event = asyncio.Event()
+        self.config: Dict = {}
+        # read once: os.environ is a locking proxy dict, and the value
+        # cannot change under a running process anyway.  The config
+        # manager may override it with an access-controlled credential.
+        self._pool_password = os.getenv("POOL_PASSWORD", "x")
+        self.telemetry = TelemetryBuffer(self._store_metrics)
+        self._mongo = None  # lazy AsyncIOMotorClient, built on first flush
+        self._metrics_server = None
+        self._metrics_task: Optional[asyncio.Task] = None
+        # sensor snapshot shared by the mining/monitoring/economic
+        # loops: each emulator getter aggregates over every core, and
+        # three loops re-reading them independently multiplied that
+        # work for values that can't meaningfully change within a tick
+        self._hw_snapshot: Dict = {}
+        self._hw_snapshot_ts = float("-inf")
+        self._hw_snapshot_lock = asyncio.Lock()
+        # bumped by whichever component refreshes exchange rates; the
+        # economic loop folds it into its recompute key so a price move
+        # forces a recompute even when the rig's output is steady
+        self.price_tick_id = 0
+        self._last_profit_inputs: Optional[tuple] = None
+        # nonce scans run here, off the event loop; the emulator's hot
+        # loop lives inside OpenSSL's scrypt, so threads interleave
+        self._miner_pool = ThreadPoolExecutor(
+            max_workers=os.cpu_count() or 2,
+            thread_name_prefix="miner")
+        # nonce window per mine_work call; initialize() replaces the
+        # default with the autotuned value for this machine
+        self._tuned_iterations = 1_000_000
+        # the user_id field of every stats line is constant for the
+        # process, so its encoded form is spliced in front of each
+        # serialized payload instead of re-encoded per tick
+        self._stats_prefix = (b'{"user_id":' + _dumps_bytes(user_id)
+                              + b",")
+        # one long-lived stats dict, overwritten in place per tick;
+        # consumers that keep a record get a shallow copy.  Saves a
+        # dict allocation per tick for the life of the process.
+        self._stats_buf: Dict = {}
+
+    # ------------------------------------------------------------------
+    # Setup
+    # ------------------------------------------------------------------
+
+    async def initialize(self) -> bool:
+        try:
+            self._load_enterprise_config()
+            # the probe blocks for its whole budget, so it runs on the
+            # miner pool like the scans it is sizing
+            self._tuned_iterations = await (
+                asyncio.get_running_loop().run_in_executor(
+                    self._miner_pool,
+                    functools.partial(autotune_mine_work,
+                                      self.hardware_emulator)))
+            logger.info("autotuned nonce window: %d",
+                        self._tuned_iterations)
+            await self._initialize_stratum_clients()
+            await self._start_metrics_exporter()
+            _M_INIT_OK.inc()
+            return True
+        except Exception:
+            logger.exception("initialization failed")
+            _M_INIT_ERR.inc()
+            return False
+
+    def _load_enterprise_config(self):
+        # one access-controlled snapshot instead of a permission check
+        # (and an audit entry) per key; only keys this user may read
+        # were materialized into it
+        cfg = self.config_manager.snapshot_for(self.user_id)
+        self.config = {
+            "ltc_pool_host": cfg.get("ltc_pool_host",
+                                     "stratum.litecoinpool.org"),
+            "ltc_pool_port": int(cfg.get("ltc_pool_port", 3333)),
+            "doge_pool_host": cfg.get("doge_pool_host", "doge.zsolo.bid"),
+            "doge_pool_port": int(cfg.get("doge_pool_port", 8057)),
+            "worker_name": cfg.get("worker_name", "enterprise"),
+            "metrics_port": int(cfg.get("metrics_port", 9090)),
+            "monitor_interval": float(cfg.get("monitor_interval", 30.0)),
+            "economic_interval": float(cfg.get("economic_interval",
+                                               60.0)),
+            "power_cost_kwh": float(cfg.get("power_cost_kwh", 0.12)),
+            "min_profit_margin": float(cfg.get("min_profit_margin", 0.0)),
+            "store_metrics": bool(cfg.get("store_metrics", False)),
+            "mongo_url": cfg.get("mongo_url", ""),
+            "merged_mining": bool(cfg.get("merged_mining", True)),
+            "doge_aux_address": cfg.get("doge_aux_address", ""),
+        }
+        self._pool_password = cfg.get("pool_password",
+                                      self._pool_password)
+
+    async def _start_metrics_exporter(self):
+        """Expose /metrics on the configured port.
+
+        Served as an ASGI app on this event loop when uvicorn is
+        available: scrapes are handled without a thread or the GIL
+        hand-off the threaded BaseHTTPServer exporter pays per request.
+        Without uvicorn the threaded server is still correct, just
+        slower under frequent scrapes.
+        """
+        if uvicorn is None:
+            start_http_server(self.config["metrics_port"])
+            return
+        server_config = uvicorn.Config(
+            make_asgi_app(), host="0.0.0.0",
+            port=self.config["metrics_port"],
+            log_level="warning", lifespan="off")
+        self._metrics_server = uvicorn.Server(server_config)
+        self._metrics_task = asyncio.get_running_loop().create_task(
+            self._metrics_server.serve())
+
+    async def _initialize_stratum_clients(self):
+        user = self.config_manager.users.get(self.user_id)
+        wallet = user.wallet_address if user else ""
+        worker = "%s.%s" % (wallet or self.user_id,
+                            self.config["worker_name"])
+        self.stratum_clients["ltc"] = EnhancedStratumClient(
+            self.config["ltc_pool_host"], self.config["ltc_pool_port"],
+            worker, password=self._pool_password, coin="ltc")
+        if not self.config["merged_mining"]:
+            # split mode for pools that don't merge: a second socket
+            # and a second mining coroutine against the DOGE pool
+            self.stratum_clients["doge"] = EnhancedStratumClient(
+                self.config["doge_pool_host"],
+                self.config["doge_pool_port"],
+                worker, password=self._pool_password, coin="doge")
+        loop = asyncio.get_running_loop()
+        for coin, client in self.stratum_clients.items():
+            queue: asyncio.Queue = asyncio.Queue(maxsize=4)
+            self.work_queues[coin] = queue
+            # notify arrives on the client's reader thread; trampoline
+            # onto the loop before touching the queue
+            client.on_new_job = (
+                lambda cl, clean, q=queue: loop.call_soon_threadsafe(
+                    self._enqueue_work, q, cl, clean))
+            client.connect()
+            client.subscribe()
+            client.authorize()
+            client.start_reader()
+        if self.config["merged_mining"]:
+            # one session carries both chains: DOGE rides the LTC
+            # coinbase via AuxPoW, so every share credits both
+            self.stratum_clients["ltc"].subscribe_aux(
+                "doge", self.config["doge_aux_address"], worker)
+
+    # ------------------------------------------------------------------
+    # Loops
+    # ------------------------------------------------------------------
+
+    async def start_mining(self):
+        self.running = True
+        self._task_group = asyncio.TaskGroup()
+        await self._task_group.__aenter__()
+        create = self._task_group.create_task
+        self._loop_tasks = [
+            create(self._mining_loop(coin, client))
+            for coin, client in self.stratum_clients.items()
+        ]
+        self._loop_tasks.append(create(self._monitoring_loop()))
+        self._loop_tasks.append(create(self._economic_monitoring_loop()))
+        self._loop_tasks.append(create(self.telemetry.run()))
+        _M_START_OK.inc()
+        logger.info("mining started for %s", ", ".join(
+            self.stratum_clients))
+
+    _HW_SNAPSHOT_TTL = 1.0
+
+    async def _get_snapshot(self) -> Dict:
+        """Hashrate/power/temperature, at most one aggregation per TTL.
+
+        The lock coalesces concurrent refreshes: whichever coroutine
+        gets there first pays the aggregation, the rest reuse it.
+        """
+        if (time.monotonic() - self._hw_snapshot_ts
+                < self._HW_SNAPSHOT_TTL):
+            return self._hw_snapshot
+        async with self._hw_snapshot_lock:
+            if (time.monotonic() - self._hw_snapshot_ts
+                    < self._HW_SNAPSHOT_TTL):
+                return self._hw_snapshot
+            hw = self.hardware_emulator
+            self._hw_snapshot = {
+                "hashrate": hw.get_current_hashrate(),
+                "power_watts": hw.get_power_consumption(),
+                "temperature": hw.get_temperature(),
+            }
+            self._hw_snapshot_ts = time.monotonic()
+            return self._hw_snapshot
+
+    def _build_work(self, client: EnhancedStratumClient
+                    ) -> Optional[Dict]:
+        """Next nonce window of the current job as a work order."""
+        with client.job_lock:
+            if client.current_job is None:
+                return None
+            work = {
+                "chains": tuple(client.active_coins),
+                "job_id": client.current_job[0],
+                "extranonce2": client.job_extranonce2,
+                "ntime": client.ntime_be[::-1].hex(),
+                "header": bytes(client._header_buf),
+                "start_nonce": client.nonce_base,
+                "target": client.difficulty_manager.target,
+            }
+            client.nonce_base = (client.nonce_base
+                                 + self._tuned_iterations) & 0xFFFFFFFF
+            return work
+
+    def _enqueue_work(self, queue: asyncio.Queue,
+                      client: EnhancedStratumClient, clean_jobs: bool):
+        """Push the next work order; runs on the event-loop thread."""
+        if clean_jobs:
+            # queued windows belong to a job the pool just invalidated
+            while not queue.empty():
+                queue.get_nowait()
+        work = self._build_work(client)
+        if work is None:
+            return
+        try:
+            queue.put_nowait(work)
+        except asyncio.QueueFull:
+            # drop the oldest window; its nonces are the stalest
+            queue.get_nowait()
+            queue.put_nowait(work)
+
+    async def _mining_loop(self, coin: str, client: EnhancedStratumClient):
+        queue = self.work_queues[coin]
+        # per-share locals: neither the emulator nor the client is
+        # swapped while running, so the attribute chains resolve once
+        # here instead of per iteration
+        mine_work = self.hardware_emulator.mine_work
+        submit_share = client.submit_share
+        get_snapshot = self._get_snapshot
+        enqueue_work = self._enqueue_work
+        run_in_executor = asyncio.get_running_loop().run_in_executor
+        miner_pool = self._miner_pool
+        tuned_iterations = self._tuned_iterations
+        while self.running:
+            try:
+                work = await queue.get()
+                # the scan blocks for the whole window, so it runs on
+                # the miner pool; the loop stays free for the other
+                # coin, telemetry and share acknowledgements meanwhile
+                result = await run_in_executor(
+                    miner_pool,
+                    functools.partial(mine_work, work,
+                                      max_iterations=tuned_iterations,
+                                      optimization_level="MAXIMUM"))
+                if result is not None:
+                    # the client returns a concurrent future fulfilled
+                    # by its reader thread; wrap it so the wait yields
+                    # instead of stalling every other task on the loop
+                    # for the pool round-trip
+                    response = await asyncio.wrap_future(submit_share(
+                        work["job_id"], work["extranonce2"],
+                        work["ntime"], "%08x" % result["nonce"]))
+                    if response.get("result"):
+                        _M_SHARE_OK.inc()
+                    else:
+                        _M_SHARE_REJ.inc()
+                snapshot = await get_snapshot()
+                HASHRATE_GAUGE.set(snapshot["hashrate"])
+                POWER_GAUGE.set(snapshot["power_watts"])
+                if queue.empty():
+                    # pool is quiet: roll the next window of the same
+                    # job so the hardware never idles waiting on notify
+                    enqueue_work(queue, client, False)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("mining loop error for %s", coin)
+                _M_LOOP_ERR.inc()
+                await asyncio.sleep(5)
+
+    async def _monitoring_loop(self):
+        while self.running:
+            try:
+                snapshot = await self._get_snapshot()
+                # raw clock sample, mirroring the audit log: building a
+                # datetime plus an ISO string per tick only matters on
+                # export, and Prometheus timestamps its own samples
+                # user_id is deliberately absent: the serialized line
+                # gets it from the pre-encoded prefix and the storage
+                # writer adds it per document on insert
+                stats = self._stats_buf
+                stats.update(
+                    ts_ns=time.time_ns(),
+                    hashrate=snapshot["hashrate"],
+                    power_watts=snapshot["power_watts"],
+                    temperature=snapshot["temperature"],
+                )
+                # per-client stats are in-memory counters, so one dict
+                # comprehension collects them all; nothing here blocks
+                # long enough to be worth fanning out
+                stats["pools"] = {coin: client.get_stats()
+                                  for coin, client
+                                  in self.stratum_clients.items()}
+                TEMPERATURE_GAUGE.set(stats["temperature"])
+                # serialization only happens when INFO is actually
+                # emitted; the record also carries the raw dict so a
+                # structured formatter can render it without reparsing
+                # consumers outlive the tick, so they get one shared
+                # shallow copy — the nested pools dict is fresh each
+                # tick, so shallow is deep enough
+                record = stats.copy()
+                if logger.isEnabledFor(logging.INFO):
+                    payload = (self._stats_prefix
+                               + _dumps_bytes(stats)[1:])
+                    logger.info("Enterprise metrics: %s",
+                                payload.decode("utf-8"),
+                                extra={"metrics": record})
+                self.telemetry.add(record)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("monitoring loop error")
+            await asyncio.sleep(self.config["monitor_interval"])
+
+    def _metrics_collection(self):
+        """The metrics collection, or None when persistence is off.
+
+        The motor client is built lazily on the first flush so a runner
+        with persistence disabled (or without motor installed) never
+        opens a connection pool.
+        """
+        if AsyncIOMotorClient is None or not self.config["mongo_url"]:
+            return None
+        if self._mongo is None:
+            self._mongo = AsyncIOMotorClient(self.config["mongo_url"])
+        return self._mongo.scryptmineos.metrics
+
+    async def _store_metrics(self, batch: List[Dict]):
+        if not self.config["store_metrics"]:
+            return
+        collection = self._metrics_collection()
+        if collection is None:
+            return
+        try:
+            # one unordered insert per batch: documents are independent
+            # samples, so a single bad one doesn't abort its siblings.
+            # Records carry raw ts_ns; any consumer needing ISO strings
+            # formats on read.
+            await collection.insert_many(
+                [dict(r, user_id=self.user_id) for r in batch],
+                ordered=False)
+        except Exception:
+            logger.exception("metrics batch insert failed "
+                             "(%d records dropped)", len(batch))
+            METRIC_BATCHES_DROPPED.inc()
+
+    async def _economic_monitoring_loop(self):
+        while self.running:
+            try:
+                snapshot = await self._get_snapshot()
+                hashrate = snapshot["hashrate"]
+                watts = snapshot["power_watts"]
+                # profitability is a pure function of (hashrate, power,
+                # price); bucket the noisy inputs and skip the recompute
+                # when nothing has meaningfully moved since last tick
+                inputs = (round(hashrate / 1e5), round(watts / 50.0),
+                          self.price_tick_id)
+                if inputs == self._last_profit_inputs:
+                    await asyncio.sleep(self.config["economic_interval"])
+                    continue
+                self._last_profit_inputs = inputs
+                cost_per_hour = watts / 1000.0 * \
+                    self.config["power_cost_kwh"]
+                # revenue estimation uses a fixed reference rate until a
+                # price feed is wired in
+                revenue_per_hour = hashrate * 1e-9
+                margin = revenue_per_hour - cost_per_hour
+                if margin < self.config["min_profit_margin"]:
+                    logger.warning(
+                        "profitability below floor: %.4f/h revenue "
+                        "vs %.4f/h power", revenue_per_hour,
+                        cost_per_hour)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("economic loop error")
+            await asyncio.sleep(self.config["economic_interval"])
+
+    # ------------------------------------------------------------------
+    # Shutdown
+    # ------------------------------------------------------------------
+
+    async def stop_mining(self):
+        self.running = False
+        for task in self._loop_tasks:
+            task.cancel()
+        if self._task_group is not None:
+            # the group absorbs the cancellations and waits until every
+            # loop has actually unwound — no dangling tasks afterwards
+            await self._task_group.__aexit__(None, None, None)
+            self._task_group = None
+        self._loop_tasks.clear()
+        await self.telemetry.flush()
+        for client in self.stratum_clients.values():
+            client.close()
+        self._miner_pool.shutdown(wait=False, cancel_futures=True)
+        self.shutdown_event.set()
+        if self._metrics_server is not None:
+            self._metrics_server.should_exit = True
+            await self._metrics_task
+            self._metrics_server = None
+            self._metrics_task = None
+        _M_STOP_OK.inc()
+        logger.info("mining stopped")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Enterprise miner")
+    parser.add_argument("--user-id", required=True)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    logger.info("event loop: %s",
+                type(asyncio.get_running_loop()).__name__)
+    system = EnterpriseMiningSystem(args.user_id)
+    if not await system.initialize():
+        return 1
+    await system.start_mining()
+    try:
+        # event-driven: zero wakeups while mining, instead of polling
+        # system.running once a second for the life of the process
+        await system.shutdown_event.wait()
+    finally:
+        if system.running:
+            await system.stop_mining()
+    return 0
+
+
+if __name__ == "__main__":
+    if uvloop is not None:
+        # must happen before asyncio.run creates the loop; on
+        # platforms without uvloop (e.g. Windows) the default policy
+        # stands
+        uvloop.install()
+    raise SystemExit(asyncio.run(main()))
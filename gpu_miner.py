@@ -0,0 +1,285 @@
+"""OpenCL scrypt miner.
+
+Connects to a Stratum pool, renders the scrypt kernel from the Jinja
+template in ``kernels/``, and searches nonce batches on the GPU.  Stratum
+I/O runs on its own reader thread so the GPU never waits on the network:
+the reader pushes decoded messages into a queue and the mining loop
+drains it non-blockingly between kernel launches.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+
+import jinja2
+import numpy as np
+import pyopencl as cl
+
+from hashing import build_coinbase, build_merkle_root, construct_block_header
+from stratum_client import StratumClient
+
+logging.basicConfig(filename="miner_error.log", level=logging.WARNING,
+                    format="%(asctime)s %(levelname)s %(message)s")
+logger = logging.getLogger(__name__)
+
+# Log the first few tracebacks of an error storm in full, then only a
+# sample, so a broken socket can't serialize the loop on file I/O.
+ERROR_LOG_FULL = 5
+ERROR_LOG_SAMPLE = 100
+
+POOL_HOST = os.getenv("POOL_HOST", "stratum.aikapool.com")
+POOL_PORT = int(os.getenv("POOL_PORT", "7915"))
+POOL_USER = os.getenv("POOL_USER", "worker")
+POOL_PASSWORD = os.getenv("POOL_PASSWORD", "x")
+
+BATCH_SIZE = 4096
+# hit-record capacity per batch; at real difficulty even one hit per
+# batch is rare, so overflow only means a lost duplicate candidate
+MAX_HITS = 16
+SCRYPT_PARAMS = {"N": 1024, "r": 1, "p": 1, "vector_width": 4,
+                 "max_hits": MAX_HITS}
+
+# Compiled once at import: kernel specialization must never pay template
+# parsing or filesystem I/O on the mining path.
+_ENV = jinja2.Environment(
+    loader=jinja2.FileSystemLoader(
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "kernels")),
+    auto_reload=False, cache_size=64)
+_TEMPLATE = _ENV.get_template("scrypt_core.cl.jinja")
+_RENDER_CACHE = {}
+
+
+def render_kernel(params):
+    """Render the scrypt kernel source, cached per parameter set."""
+    key = frozenset(params.items())
+    source = _RENDER_CACHE.get(key)
+    if source is None:
+        source = _RENDER_CACHE[key] = _TEMPLATE.render(**params)
+    return source
+
+
+def start_stratum_reader(client, msg_q):
+    """Pump pool messages into ``msg_q`` from a daemon thread.
+
+    Keeps ``client.receive_message()`` (blocking TCP) off the mining loop;
+    the GPU side only ever does a non-blocking ``get_nowait``.
+    """
+    def pump():
+        while True:
+            try:
+                msg_q.put(client.receive_message())
+            except (ConnectionError, OSError):
+                msg_q.put(None)  # sentinel: connection lost
+                return
+
+    thread = threading.Thread(target=pump, name="stratum-reader", daemon=True)
+    thread.start()
+    return thread
+
+
+def drain_notifications(client, msg_q):
+    """Apply every queued pool message without blocking."""
+    while True:
+        try:
+            message = msg_q.get_nowait()
+        except queue.Empty:
+            return
+        if message is None:
+            raise ConnectionError("stratum reader thread lost the connection")
+        if "method" in message:
+            client.handle_notification(message)
+
+
+def header_to_words(header):
+    """Repack an 80-byte header as the big-endian u32 words SHA-256 wants."""
+    return np.frombuffer(header, dtype=">u4").astype(np.uint32)
+
+
+def select_devices(max_devices=4):
+    """Pick the fastest GPUs across every platform, best first.
+
+    ``[0][0]`` routinely lands on CPU OpenCL or an iGPU on laptops and
+    multi-GPU rigs; score real GPUs by compute units x clock instead and
+    shard work over the top ``max_devices``.  Devices under 1 GiB are
+    skipped because the scrypt V buffers need real VRAM.
+    """
+    scored = []
+    for platform in cl.get_platforms():
+        for device in platform.get_devices():
+            if not (device.type & cl.device_type.GPU):
+                continue
+            if device.global_mem_size < (1 << 30):
+                continue
+            score = device.max_compute_units * device.max_clock_frequency
+            scored.append((score, device))
+    if not scored:
+        # no discrete GPU at all: run on whatever the platform offers
+        return [cl.get_platforms()[0].get_devices()[0]]
+    scored.sort(key=lambda item: item[0], reverse=True)
+    return [device for _, device in scored[:max_devices]]
+
+
+def kernel_build_options(device):
+    """Build options for the scrypt kernel on ``device``.
+
+    Salsa20/8 is pure integer work, so relaxed math is a no-op but safe;
+    MAD and hardware rotate hints are where the win is.  On AMD the
+    ``cl_amd_media_ops`` extension unlocks ``amd_bitalign`` for rotates.
+    """
+    options = ["-cl-mad-enable", "-cl-fast-relaxed-math"]
+    if "cl_amd_media_ops" in device.extensions:
+        options.append("-DAMD_FASTPATH=1")
+    return options
+
+
+def main():
+    client = StratumClient(POOL_HOST, POOL_PORT, POOL_USER, POOL_PASSWORD)
+    client.connect()
+    client.subscribe()
+    client.authorize()
+
+    msg_q = queue.Queue()
+    start_stratum_reader(client, msg_q)
+
+    devices = select_devices(int(os.getenv("MAX_GPUS", "4")))
+    mf = cl.mem_flags
+
+    contexts, cl_queues, programs = [], [], []
+    for device in devices:
+        context = cl.Context([device])
+        contexts.append(context)
+        cl_queues.append(cl.CommandQueue(context))
+        programs.append(
+            cl.Program(context, render_kernel(SCRYPT_PARAMS)).build(
+                options=kernel_build_options(device)))
+
+    n_dev = len(devices)
+    # hit buffer per device: atomic count + (nonce, 8 hash words) records
+    output_hosts = [np.empty(1 + MAX_HITS * 9, dtype=np.uint32)
+                    for _ in range(n_dev)]
+
+    # Every device buffer is allocated exactly once here; the job loop
+    # only ever refreshes contents.  Reallocating per mining.notify
+    # fragments the driver heap on a busy pool.
+    input_bufs, input_maps, output_bufs, v_bufs = [], [], [], []
+    for context, cl_queue in zip(contexts, cl_queues):
+        input_buf = cl.Buffer(context, mf.READ_ONLY | mf.ALLOC_HOST_PTR,
+                              size=80)
+        # ALLOC_HOST_PTR + a permanent WRITE_INVALIDATE map gives a
+        # pinned region the host can memcpy into with zero driver calls;
+        # supported zero-copy on both NVIDIA and AMD
+        input_map, _ = cl.enqueue_map_buffer(
+            cl_queue, input_buf, cl.map_flags.WRITE_INVALIDATE_REGION,
+            0, (20,), np.uint32)
+        input_bufs.append(input_buf)
+        input_maps.append(input_map)
+        output_bufs.append(
+            cl.Buffer(context, mf.READ_WRITE, size=output_hosts[0].nbytes))
+        v_bufs.append(
+            cl.Buffer(context, mf.READ_WRITE,
+                      size=BATCH_SIZE * SCRYPT_PARAMS["N"]
+                      * 128 * SCRYPT_PARAMS["r"]))
+
+    current_job = None
+    extranonce2_counter = 0
+    base_nonce = 0
+    consecutive_errors = 0
+
+    while True:
+        try:
+            drain_notifications(client, msg_q)
+
+            if client.job_id is None:
+                time.sleep(0.1)
+                continue
+
+            with client.job_lock:
+                job_id = client.job_id
+                ntime = client.ntime
+                merkle_branch = list(client.merkle_branch)
+                coinb1, coinb2 = client.coinb1, client.coinb2
+                version, prevhash, nbits = (client.version, client.prevhash,
+                                            client.nbits)
+
+            new_job = job_id != current_job
+            rollover = (not new_job
+                        and base_nonce > 0xFFFFFFFF - BATCH_SIZE * n_dev)
+            if new_job:
+                current_job = job_id
+                extranonce2_counter = 0
+                base_nonce = 0
+            elif rollover:
+                # nonce space exhausted: roll extranonce2 and rebuild header
+                extranonce2_counter += 1
+                base_nonce = 0
+
+            if new_job or rollover:
+                extranonce2 = extranonce2_counter.to_bytes(
+                    client.extranonce2_size, "big").hex()
+                coinbase = build_coinbase(coinb1, client.extranonce1,
+                                          extranonce2, coinb2)
+                merkle_root = build_merkle_root(coinbase, merkle_branch)
+                header = construct_block_header(version, prevhash, merkle_root,
+                                                ntime, nbits)
+                input_data = header_to_words(header)
+                # memcpy into the pinned map; the marker orders the write
+                # before the next launch without a host-blocking copy
+                for cl_queue, input_map in zip(cl_queues, input_maps):
+                    input_map[:] = input_data
+                    cl.enqueue_marker(cl_queue)
+
+            # parsed once per difficulty change in StratumClient
+            target_int = client.target_int
+            target_hi = client.target_hi
+
+            # launch every device before reading any result so the GPUs
+            # overlap; each device owns its own slice of the nonce space
+            for idx in range(n_dev):
+                # reset the atomic hit counter; records beyond it are
+                # stale and ignored by the host scan
+                cl.enqueue_fill_buffer(cl_queues[idx], output_bufs[idx],
+                                       np.uint32(0), 0, 4)
+                programs[idx].scrypt_hash(
+                    cl_queues[idx], (BATCH_SIZE,), None,
+                    input_bufs[idx],
+                    np.uint32(base_nonce + idx * BATCH_SIZE),
+                    np.uint64(target_hi),
+                    v_bufs[idx], output_bufs[idx])
+            for idx in range(n_dev):
+                cl.enqueue_copy(cl_queues[idx], output_hosts[idx],
+                                output_bufs[idx]).wait()
+
+            for idx in range(n_dev):
+                output_host = output_hosts[idx]
+                # the kernel pre-filtered on the top 64 target bits, so
+                # only the rare candidates need the full 256-bit check
+                for i in range(min(int(output_host[0]), MAX_HITS)):
+                    record = output_host[1 + i * 9:1 + (i + 1) * 9]
+                    hash_bytes = record[1:].byteswap().tobytes()
+                    if int.from_bytes(hash_bytes, "little") > target_int:
+                        continue
+                    extranonce2 = extranonce2_counter.to_bytes(
+                        client.extranonce2_size, "big").hex()
+                    nonce_hex = "%08x" % int(record[0])
+                    client.submit_share(job_id, extranonce2, ntime,
+                                        nonce_hex)
+                    print("share found: nonce=%s hash=%s"
+                          % (nonce_hex, hash_bytes[::-1].hex()))
+
+            base_nonce += BATCH_SIZE * n_dev
+            consecutive_errors = 0
+        except ConnectionError:
+            raise
+        except Exception:
+            consecutive_errors += 1
+            if (consecutive_errors <= ERROR_LOG_FULL
+                    or consecutive_errors % ERROR_LOG_SAMPLE == 0):
+                logger.exception("mining loop error (x%d)",
+                                 consecutive_errors)
+            time.sleep(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Block-header hashing helpers shared by the miners.
+
+Everything here operates on the hex-string job fields exactly as they
+arrive from Stratum (`mining.notify` params) and produces the raw bytes
+the scrypt kernel consumes.
+"""
+
+import hashlib
+import struct
+
+try:
+    import _sha256d_ni
+except ImportError:
+    _sha256d_ni = None
+
+# Backend dispatch happens exactly once, here at import: the extension
+# probes CPUID (__builtin_cpu_supports("sha")) when it loads and binds
+# its transform pointer, and this module binds the resulting callables.
+# Hot paths call sha256d/sha256d_64 directly with no per-call branching.
+if _sha256d_ni is not None:
+    sha256d = _sha256d_ni.sha256d
+    # fixed-64-byte specialization: padding is baked in, no length branch
+    sha256d_64 = _sha256d_ni.sha256d_64
+    SHA256D_BACKEND = "sha-ni" if _sha256d_ni.has_shani else "portable-c"
+else:
+    def sha256d(data):
+        """Double SHA-256, the Bitcoin-family hash used for the Merkle tree."""
+        return hashlib.sha256(hashlib.sha256(data).digest()).digest()
+
+    sha256d_64 = sha256d
+    SHA256D_BACKEND = "hashlib"
+
+
+# little-endian nonce field; prebound Struct skips the per-call format
+# parse and the NumPy scalar round-trip the header path used before
+_NONCE_STRUCT = struct.Struct("<I")
+
+
+def build_coinbase(coinb1, extranonce1, extranonce2, coinb2):
+    """Assemble the coinbase transaction from the Stratum job pieces."""
+    return bytes.fromhex(coinb1 + extranonce1 + extranonce2 + coinb2)
+
+
+def swap_prevhash_words(prevhash):
+    """Header-order bytes for a Stratum ``prevhash`` hex field.
+
+    Stratum v1 sends prevhash pre-swapped as eight 32-bit words: the
+    header wants each word's bytes reversed while the word order is
+    kept.  A plain ``[::-1]`` over all 32 bytes additionally mirrors
+    the word order and produces a header no pool will accept.
+    """
+    h = bytes.fromhex(prevhash)
+    return b"".join(h[i:i + 4][::-1] for i in range(0, 32, 4))
+
+
+def build_merkle_root(coinbase, merkle_branch):
+    """Fold the coinbase hash through the job's Merkle branch.
+
+    ``merkle_branch`` is the list of hex hashes from ``mining.notify``;
+    the result is the 32-byte Merkle root in header (internal) order.
+    """
+    return fold_merkle_branch(
+        sha256d(coinbase),
+        [bytes.fromhex(branch) for branch in merkle_branch])
+
+
+def fold_merkle_branch(leaf_hash, branch_bytes):
+    """Fold a 32-byte hash through pre-parsed 32-byte branch hashes.
+
+    Callers that keep the branch bytes cached per job (the hex is
+    constant across a job) skip the ``bytes.fromhex`` pass entirely.
+    With the extension present the whole walk is one C call: no
+    interpreter dispatch or concatenation per level.
+    """
+    if _sha256d_ni is not None:
+        return _sha256d_ni.sha256d_fold(leaf_hash, b"".join(branch_bytes))
+    # fallback: one reusable 64-byte block instead of a concat per level
+    block = bytearray(64)
+    block[:32] = leaf_hash
+    for branch in branch_bytes:
+        block[32:] = branch
+        block[:32] = sha256d_64(block)
+    return bytes(block[:32])
+
+
+def build_merkle_roots(coinbases, merkle_branch):
+    """Merkle roots for many coinbases that share one job branch.
+
+    All lanes walk the branch in lockstep; with the extension present
+    each level is a single GIL-free C call over every lane's 64-byte
+    block instead of one Python-dispatched hash per lane.
+    """
+    roots = [sha256d(coinbase) for coinbase in coinbases]
+    branch_bytes = [bytes.fromhex(branch) for branch in merkle_branch]
+    if _sha256d_ni is not None:
+        for branch in branch_bytes:
+            batch = b"".join(root + branch for root in roots)
+            digests = _sha256d_ni.sha256d_64_batch(batch)
+            roots = [digests[i * 32:(i + 1) * 32]
+                     for i in range(len(roots))]
+    else:
+        for branch in branch_bytes:
+            roots = [sha256d(root + branch) for root in roots]
+    return roots
+
+
+def construct_block_headers(version, prevhash, ntime, nbits, coinb1,
+                            extranonce1, coinb2, merkle_branch,
+                            extranonce2_list):
+    """Build one 80-byte header (nonce zeroed) per extranonce2 value.
+
+    The shared prefix/suffix are parsed once and only the coinbase leaf
+    differs per lane, so header construction cost is dominated by the
+    batched Merkle walk.
+    """
+    coinbases = [build_coinbase(coinb1, extranonce1, extranonce2, coinb2)
+                 for extranonce2 in extranonce2_list]
+    roots = build_merkle_roots(coinbases, merkle_branch)
+    prefix = bytes.fromhex(version)[::-1] + swap_prevhash_words(prevhash)
+    suffix = (bytes.fromhex(ntime)[::-1] + bytes.fromhex(nbits)[::-1]
+              + b"\x00\x00\x00\x00")
+    return [prefix + root + suffix for root in roots]
+
+
+def construct_block_header(version, prevhash, merkle_root, ntime, nbits,
+                           nonce=0):
+    """Build the 80-byte little-endian block header.
+
+    ``version``, ``prevhash``, ``ntime`` and ``nbits`` are the hex strings
+    from the job notification; ``merkle_root`` is raw bytes from
+    :func:`build_merkle_root`.
+    """
+    return (
+        bytes.fromhex(version)[::-1]
+        + swap_prevhash_words(prevhash)
+        + merkle_root
+        + bytes.fromhex(ntime)[::-1]
+        + bytes.fromhex(nbits)[::-1]
+        + _NONCE_STRUCT.pack(nonce)
+    )
+
+
+def build_header_prefix(version, prevhash, merkle_root):
+    """First 64 bytes of the header: one full SHA-256 block.
+
+    Version, prevhash and the first 28 bytes of the Merkle root are
+    constant across a job's nonce scan, so this block only needs to be
+    absorbed once per job (see :func:`header_midstate`).
+    """
+    return (bytes.fromhex(version)[::-1]
+            + swap_prevhash_words(prevhash)
+            + merkle_root[:28])
+
+
+if _sha256d_ni is not None:
+    # per-job state after the constant first block; per nonce only the
+    # 16-byte tail transform plus the inner hash remain (3 transforms
+    # instead of 4)
+    header_midstate = _sha256d_ni.sha256_midstate
+    sha256d_from_midstate = _sha256d_ni.sha256d_from_midstate
+else:
+    def header_midstate(prefix):
+        """Fallback "midstate": keep the raw prefix and rehash in full."""
+        return bytes(prefix)
+
+    def sha256d_from_midstate(midstate, tail):
+        return sha256d(midstate + tail)
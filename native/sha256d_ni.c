@@ -0,0 +1,638 @@
+/*
+ * _sha256d_ni: double-SHA256 for the block-header hot path.
+ *
+ * Uses the Intel SHA extensions (SHA-NI) when the CPU has them, falling
+ * back to a portable C implementation otherwise.  The backend is picked
+ * once at module import via __builtin_cpu_supports("sha").
+ *
+ * Build in place with:  python setup_native.py build_ext --inplace
+ * hashing.py degrades to hashlib transparently when this module is
+ * absent.
+ */
+
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+
+#include <stdint.h>
+#include <string.h>
+
+#if defined(__x86_64__) || defined(__i386__)
+#include <immintrin.h>
+#define HAVE_SHANI_BUILD 1
+#endif
+
+/* ------------------------------------------------------------------ */
+/* Portable implementation                                            */
+/* ------------------------------------------------------------------ */
+
+static const uint32_t K256[64] = {
+    0x428a2f98, 0x71374491, 0xb5c0fbcf, 0xe9b5dba5,
+    0x3956c25b, 0x59f111f1, 0x923f82a4, 0xab1c5ed5,
+    0xd807aa98, 0x12835b01, 0x243185be, 0x550c7dc3,
+    0x72be5d74, 0x80deb1fe, 0x9bdc06a7, 0xc19bf174,
+    0xe49b69c1, 0xefbe4786, 0x0fc19dc6, 0x240ca1cc,
+    0x2de92c6f, 0x4a7484aa, 0x5cb0a9dc, 0x76f988da,
+    0x983e5152, 0xa831c66d, 0xb00327c8, 0xbf597fc7,
+    0xc6e00bf3, 0xd5a79147, 0x06ca6351, 0x14292967,
+    0x27b70a85, 0x2e1b2138, 0x4d2c6dfc, 0x53380d13,
+    0x650a7354, 0x766a0abb, 0x81c2c92e, 0x92722c85,
+    0xa2bfe8a1, 0xa81a664b, 0xc24b8b70, 0xc76c51a3,
+    0xd192e819, 0xd6990624, 0xf40e3585, 0x106aa070,
+    0x19a4c116, 0x1e376c08, 0x2748774c, 0x34b0bcb5,
+    0x391c0cb3, 0x4ed8aa4a, 0x5b9cca4f, 0x682e6ff3,
+    0x748f82ee, 0x78a5636f, 0x84c87814, 0x8cc70208,
+    0x90befffa, 0xa4506ceb, 0xbef9a3f7, 0xc67178f2
+};
+
+static const uint32_t IV256[8] = {
+    0x6a09e667, 0xbb67ae85, 0x3c6ef372, 0xa54ff53a,
+    0x510e527f, 0x9b05688c, 0x1f83d9ab, 0x5be0cd19
+};
+
+#define ROTR(x, n) (((x) >> (n)) | ((x) << (32 - (n))))
+#define CH(x, y, z) (((x) & (y)) ^ (~(x) & (z)))
+#define MAJ(x, y, z) (((x) & (y)) ^ ((x) & (z)) ^ ((y) & (z)))
+#define EP0(x) (ROTR(x, 2) ^ ROTR(x, 13) ^ ROTR(x, 22))
+#define EP1(x) (ROTR(x, 6) ^ ROTR(x, 11) ^ ROTR(x, 25))
+#define SIG0(x) (ROTR(x, 7) ^ ROTR(x, 18) ^ ((x) >> 3))
+#define SIG1(x) (ROTR(x, 17) ^ ROTR(x, 19) ^ ((x) >> 10))
+
+static uint32_t load_be32(const uint8_t *p)
+{
+    return ((uint32_t)p[0] << 24) | ((uint32_t)p[1] << 16)
+         | ((uint32_t)p[2] << 8) | (uint32_t)p[3];
+}
+
+static void store_be32(uint8_t *p, uint32_t v)
+{
+    p[0] = (uint8_t)(v >> 24);
+    p[1] = (uint8_t)(v >> 16);
+    p[2] = (uint8_t)(v >> 8);
+    p[3] = (uint8_t)v;
+}
+
+static void transform_portable(uint32_t state[8], const uint8_t *data,
+                               size_t blocks)
+{
+    uint32_t w[64];
+    uint32_t a, b, c, d, e, f, g, h, t1, t2;
+    size_t i;
+
+    while (blocks--) {
+        for (i = 0; i < 16; i++)
+            w[i] = load_be32(data + i * 4);
+        for (i = 16; i < 64; i++)
+            w[i] = SIG1(w[i - 2]) + w[i - 7] + SIG0(w[i - 15]) + w[i - 16];
+
+        a = state[0]; b = state[1]; c = state[2]; d = state[3];
+        e = state[4]; f = state[5]; g = state[6]; h = state[7];
+
+        for (i = 0; i < 64; i++) {
+            t1 = h + EP1(e) + CH(e, f, g) + K256[i] + w[i];
+            t2 = EP0(a) + MAJ(a, b, c);
+            h = g; g = f; f = e; e = d + t1;
+            d = c; c = b; b = a; a = t1 + t2;
+        }
+
+        state[0] += a; state[1] += b; state[2] += c; state[3] += d;
+        state[4] += e; state[5] += f; state[6] += g; state[7] += h;
+        data += 64;
+    }
+}
+
+/* ------------------------------------------------------------------ */
+/* SHA-NI implementation (canonical Gulley/Walton round structure)     */
+/* ------------------------------------------------------------------ */
+
+#ifdef HAVE_SHANI_BUILD
+__attribute__((target("sha,sse4.1")))
+static void transform_shani(uint32_t state[8], const uint8_t *data,
+                            size_t blocks)
+{
+    __m128i STATE0, STATE1, MSG, TMP, MASK;
+    __m128i MSG0, MSG1, MSG2, MSG3;
+    __m128i ABEF_SAVE, CDGH_SAVE;
+
+    TMP = _mm_loadu_si128((const __m128i *)&state[0]);
+    STATE1 = _mm_loadu_si128((const __m128i *)&state[4]);
+    MASK = _mm_set_epi64x(0x0c0d0e0f08090a0bULL, 0x0405060700010203ULL);
+
+    TMP = _mm_shuffle_epi32(TMP, 0xB1);          /* CDAB */
+    STATE1 = _mm_shuffle_epi32(STATE1, 0x1B);    /* EFGH */
+    STATE0 = _mm_alignr_epi8(TMP, STATE1, 8);    /* ABEF */
+    STATE1 = _mm_blend_epi16(STATE1, TMP, 0xF0); /* CDGH */
+
+    while (blocks--) {
+        ABEF_SAVE = STATE0;
+        CDGH_SAVE = STATE1;
+
+        /* Rounds 0-3 */
+        MSG = _mm_loadu_si128((const __m128i *)(data + 0));
+        MSG0 = _mm_shuffle_epi8(MSG, MASK);
+        MSG = _mm_add_epi32(MSG0,
+            _mm_set_epi64x(0xE9B5DBA5B5C0FBCFULL, 0x71374491428A2F98ULL));
+        STATE1 = _mm_sha256rnds2_epu32(STATE1, STATE0, MSG);
+        MSG = _mm_shuffle_epi32(MSG, 0x0E);
+        STATE0 = _mm_sha256rnds2_epu32(STATE0, STATE1, MSG);
+
+        /* Rounds 4-7 */
+        MSG1 = _mm_loadu_si128((const __m128i *)(data + 16));
+        MSG1 = _mm_shuffle_epi8(MSG1, MASK);
+        MSG = _mm_add_epi32(MSG1,
+            _mm_set_epi64x(0xAB1C5ED5923F82A4ULL, 0x59F111F13956C25BULL));
+        STATE1 = _mm_sha256rnds2_epu32(STATE1, STATE0, MSG);
+        MSG = _mm_shuffle_epi32(MSG, 0x0E);
+        STATE0 = _mm_sha256rnds2_epu32(STATE0, STATE1, MSG);
+        MSG0 = _mm_sha256msg1_epu32(MSG0, MSG1);
+
+        /* Rounds 8-11 */
+        MSG2 = _mm_loadu_si128((const __m128i *)(data + 32));
+        MSG2 = _mm_shuffle_epi8(MSG2, MASK);
+        MSG = _mm_add_epi32(MSG2,
+            _mm_set_epi64x(0x550C7DC3243185BEULL, 0x12835B01D807AA98ULL));
+        STATE1 = _mm_sha256rnds2_epu32(STATE1, STATE0, MSG);
+        MSG = _mm_shuffle_epi32(MSG, 0x0E);
+        STATE0 = _mm_sha256rnds2_epu32(STATE0, STATE1, MSG);
+        MSG1 = _mm_sha256msg1_epu32(MSG1, MSG2);
+
+        /* Rounds 12-15 */
+        MSG3 = _mm_loadu_si128((const __m128i *)(data + 48));
+        MSG3 = _mm_shuffle_epi8(MSG3, MASK);
+        MSG = _mm_add_epi32(MSG3,
+            _mm_set_epi64x(0xC19BF1749BDC06A7ULL, 0x80DEB1FE72BE5D74ULL));
+        STATE1 = _mm_sha256rnds2_epu32(STATE1, STATE0, MSG);
+        TMP = _mm_alignr_epi8(MSG3, MSG2, 4);
+        MSG0 = _mm_add_epi32(MSG0, TMP);
+        MSG0 = _mm_sha256msg2_epu32(MSG0, MSG3);
+        MSG = _mm_shuffle_epi32(MSG, 0x0E);
+        STATE0 = _mm_sha256rnds2_epu32(STATE0, STATE1, MSG);
+        MSG2 = _mm_sha256msg1_epu32(MSG2, MSG3);
+
+        /* Rounds 16-19 */
+        MSG = _mm_add_epi32(MSG0,
+            _mm_set_epi64x(0x240CA1CC0FC19DC6ULL, 0xEFBE4786E49B69C1ULL));
+        STATE1 = _mm_sha256rnds2_epu32(STATE1, STATE0, MSG);
+        TMP = _mm_alignr_epi8(MSG0, MSG3, 4);
+        MSG1 = _mm_add_epi32(MSG1, TMP);
+        MSG1 = _mm_sha256msg2_epu32(MSG1, MSG0);
+        MSG = _mm_shuffle_epi32(MSG, 0x0E);
+        STATE0 = _mm_sha256rnds2_epu32(STATE0, STATE1, MSG);
+        MSG3 = _mm_sha256msg1_epu32(MSG3, MSG0);
+
+        /* Rounds 20-23 */
+        MSG = _mm_add_epi32(MSG1,
+            _mm_set_epi64x(0x76F988DA5CB0A9DCULL, 0x4A7484AA2DE92C6FULL));
+        STATE1 = _mm_sha256rnds2_epu32(STATE1, STATE0, MSG);
+        TMP = _mm_alignr_epi8(MSG1, MSG0, 4);
+        MSG2 = _mm_add_epi32(MSG2, TMP);
+        MSG2 = _mm_sha256msg2_epu32(MSG2, MSG1);
+        MSG = _mm_shuffle_epi32(MSG, 0x0E);
+        STATE0 = _mm_sha256rnds2_epu32(STATE0, STATE1, MSG);
+        MSG0 = _mm_sha256msg1_epu32(MSG0, MSG1);
+
+        /* Rounds 24-27 */
+        MSG = _mm_add_epi32(MSG2,
+            _mm_set_epi64x(0xBF597FC7B00327C8ULL, 0xA831C66D983E5152ULL));
+        STATE1 = _mm_sha256rnds2_epu32(STATE1, STATE0, MSG);
+        TMP = _mm_alignr_epi8(MSG2, MSG1, 4);
+        MSG3 = _mm_add_epi32(MSG3, TMP);
+        MSG3 = _mm_sha256msg2_epu32(MSG3, MSG2);
+        MSG = _mm_shuffle_epi32(MSG, 0x0E);
+        STATE0 = _mm_sha256rnds2_epu32(STATE0, STATE1, MSG);
+        MSG1 = _mm_sha256msg1_epu32(MSG1, MSG2);
+
+        /* Rounds 28-31 */
+        MSG = _mm_add_epi32(MSG3,
+            _mm_set_epi64x(0x1429296706CA6351ULL, 0xD5A79147C6E00BF3ULL));
+        STATE1 = _mm_sha256rnds2_epu32(STATE1, STATE0, MSG);
+        TMP = _mm_alignr_epi8(MSG3, MSG2, 4);
+        MSG0 = _mm_add_epi32(MSG0, TMP);
+        MSG0 = _mm_sha256msg2_epu32(MSG0, MSG3);
+        MSG = _mm_shuffle_epi32(MSG, 0x0E);
+        STATE0 = _mm_sha256rnds2_epu32(STATE0, STATE1, MSG);
+        MSG2 = _mm_sha256msg1_epu32(MSG2, MSG3);
+
+        /* Rounds 32-35 */
+        MSG = _mm_add_epi32(MSG0,
+            _mm_set_epi64x(0x53380D134D2C6DFCULL, 0x2E1B213827B70A85ULL));
+        STATE1 = _mm_sha256rnds2_epu32(STATE1, STATE0, MSG);
+        TMP = _mm_alignr_epi8(MSG0, MSG3, 4);
+        MSG1 = _mm_add_epi32(MSG1, TMP);
+        MSG1 = _mm_sha256msg2_epu32(MSG1, MSG0);
+        MSG = _mm_shuffle_epi32(MSG, 0x0E);
+        STATE0 = _mm_sha256rnds2_epu32(STATE0, STATE1, MSG);
+        MSG3 = _mm_sha256msg1_epu32(MSG3, MSG0);
+
+        /* Rounds 36-39 */
+        MSG = _mm_add_epi32(MSG1,
+            _mm_set_epi64x(0x92722C8581C2C92EULL, 0x766A0ABB650A7354ULL));
+        STATE1 = _mm_sha256rnds2_epu32(STATE1, STATE0, MSG);
+        TMP = _mm_alignr_epi8(MSG1, MSG0, 4);
+        MSG2 = _mm_add_epi32(MSG2, TMP);
+        MSG2 = _mm_sha256msg2_epu32(MSG2, MSG1);
+        MSG = _mm_shuffle_epi32(MSG, 0x0E);
+        STATE0 = _mm_sha256rnds2_epu32(STATE0, STATE1, MSG);
+        MSG0 = _mm_sha256msg1_epu32(MSG0, MSG1);
+
+        /* Rounds 40-43 */
+        MSG = _mm_add_epi32(MSG2,
+            _mm_set_epi64x(0xC76C51A3C24B8B70ULL, 0xA81A664BA2BFE8A1ULL));
+        STATE1 = _mm_sha256rnds2_epu32(STATE1, STATE0, MSG);
+        TMP = _mm_alignr_epi8(MSG2, MSG1, 4);
+        MSG3 = _mm_add_epi32(MSG3, TMP);
+        MSG3 = _mm_sha256msg2_epu32(MSG3, MSG2);
+        MSG = _mm_shuffle_epi32(MSG, 0x0E);
+        STATE0 = _mm_sha256rnds2_epu32(STATE0, STATE1, MSG);
+        MSG1 = _mm_sha256msg1_epu32(MSG1, MSG2);
+
+        /* Rounds 44-47 */
+        MSG = _mm_add_epi32(MSG3,
+            _mm_set_epi64x(0x106AA070F40E3585ULL, 0xD6990624D192E819ULL));
+        STATE1 = _mm_sha256rnds2_epu32(STATE1, STATE0, MSG);
+        TMP = _mm_alignr_epi8(MSG3, MSG2, 4);
+        MSG0 = _mm_add_epi32(MSG0, TMP);
+        MSG0 = _mm_sha256msg2_epu32(MSG0, MSG3);
+        MSG = _mm_shuffle_epi32(MSG, 0x0E);
+        STATE0 = _mm_sha256rnds2_epu32(STATE0, STATE1, MSG);
+        MSG2 = _mm_sha256msg1_epu32(MSG2, MSG3);
+
+        /* Rounds 48-51 */
+        MSG = _mm_add_epi32(MSG0,
+            _mm_set_epi64x(0x34B0BCB52748774CULL, 0x1E376C0819A4C116ULL));
+        STATE1 = _mm_sha256rnds2_epu32(STATE1, STATE0, MSG);
+        TMP = _mm_alignr_epi8(MSG0, MSG3, 4);
+        MSG1 = _mm_add_epi32(MSG1, TMP);
+        MSG1 = _mm_sha256msg2_epu32(MSG1, MSG0);
+        MSG = _mm_shuffle_epi32(MSG, 0x0E);
+        STATE0 = _mm_sha256rnds2_epu32(STATE0, STATE1, MSG);
+        MSG3 = _mm_sha256msg1_epu32(MSG3, MSG0);
+
+        /* Rounds 52-55 */
+        MSG = _mm_add_epi32(MSG1,
+            _mm_set_epi64x(0x682E6FF35B9CCA4FULL, 0x4ED8AA4A391C0CB3ULL));
+        STATE1 = _mm_sha256rnds2_epu32(STATE1, STATE0, MSG);
+        TMP = _mm_alignr_epi8(MSG1, MSG0, 4);
+        MSG2 = _mm_add_epi32(MSG2, TMP);
+        MSG2 = _mm_sha256msg2_epu32(MSG2, MSG1);
+        MSG = _mm_shuffle_epi32(MSG, 0x0E);
+        STATE0 = _mm_sha256rnds2_epu32(STATE0, STATE1, MSG);
+
+        /* Rounds 56-59 */
+        MSG = _mm_add_epi32(MSG2,
+            _mm_set_epi64x(0x8CC7020884C87814ULL, 0x78A5636F748F82EEULL));
+        STATE1 = _mm_sha256rnds2_epu32(STATE1, STATE0, MSG);
+        TMP = _mm_alignr_epi8(MSG2, MSG1, 4);
+        MSG3 = _mm_add_epi32(MSG3, TMP);
+        MSG3 = _mm_sha256msg2_epu32(MSG3, MSG2);
+        MSG = _mm_shuffle_epi32(MSG, 0x0E);
+        STATE0 = _mm_sha256rnds2_epu32(STATE0, STATE1, MSG);
+
+        /* Rounds 60-63 */
+        MSG = _mm_add_epi32(MSG3,
+            _mm_set_epi64x(0xC67178F2BEF9A3F7ULL, 0xA4506CEB90BEFFFAULL));
+        STATE1 = _mm_sha256rnds2_epu32(STATE1, STATE0, MSG);
+        MSG = _mm_shuffle_epi32(MSG, 0x0E);
+        STATE0 = _mm_sha256rnds2_epu32(STATE0, STATE1, MSG);
+
+        STATE0 = _mm_add_epi32(STATE0, ABEF_SAVE);
+        STATE1 = _mm_add_epi32(STATE1, CDGH_SAVE);
+
+        data += 64;
+    }
+
+    TMP = _mm_shuffle_epi32(STATE0, 0x1B);       /* FEBA */
+    STATE1 = _mm_shuffle_epi32(STATE1, 0xB1);    /* DCHG */
+    STATE0 = _mm_blend_epi16(TMP, STATE1, 0xF0); /* DCBA */
+    STATE1 = _mm_alignr_epi8(STATE1, TMP, 8);    /* HGFE */
+
+    _mm_storeu_si128((__m128i *)&state[0], STATE0);
+    _mm_storeu_si128((__m128i *)&state[4], STATE1);
+}
+#endif /* HAVE_SHANI_BUILD */
+
+/* Selected once at module import. */
+static void (*sha256_transform)(uint32_t[8], const uint8_t *, size_t)
+    = transform_portable;
+static int have_shani = 0;
+
+/* ------------------------------------------------------------------ */
+/* Full hashes                                                        */
+/* ------------------------------------------------------------------ */
+
+static void sha256_full(uint8_t out[32], const uint8_t *data, size_t len)
+{
+    uint32_t state[8];
+    uint8_t last[128];
+    size_t blocks = len / 64;
+    size_t rem = len - blocks * 64;
+    size_t padlen = (rem < 56) ? 64 : 128;
+    uint64_t bitlen = (uint64_t)len * 8;
+    int i;
+
+    memcpy(state, IV256, sizeof(state));
+    if (blocks)
+        sha256_transform(state, data, blocks);
+
+    memcpy(last, data + blocks * 64, rem);
+    last[rem] = 0x80;
+    memset(last + rem + 1, 0, padlen - rem - 9);
+    for (i = 0; i < 8; i++)
+        last[padlen - 1 - i] = (uint8_t)(bitlen >> (8 * i));
+    sha256_transform(state, last, padlen / 64);
+
+    for (i = 0; i < 8; i++)
+        store_be32(out + i * 4, state[i]);
+}
+
+static void sha256d_raw(uint8_t out[32], const uint8_t *data, size_t len)
+{
+    uint8_t inner[32];
+
+    sha256_full(inner, data, len);
+    sha256_full(out, inner, 32);
+}
+
+/* Padding block for a 64-byte message (0x80, zeros, bitlen 0x200). */
+static const uint8_t PAD512[64] = {
+    0x80, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0x02, 0x00
+};
+
+/*
+ * Double SHA-256 specialized for exactly 64 bytes of input (one Merkle
+ * step).  Padding for both hashes is baked in: no length branches, no
+ * scratch bookkeeping, four fixed block transforms total.
+ */
+static void sha256d_64_raw(uint8_t out[32], const uint8_t *in)
+{
+    uint32_t state[8];
+    uint8_t block[64];
+    int i;
+
+    memcpy(state, IV256, sizeof(state));
+    sha256_transform(state, in, 1);
+    sha256_transform(state, PAD512, 1);
+
+    /* outer hash: digest || 0x80 || zeros || bitlen 0x100, one block */
+    memset(block, 0, sizeof(block));
+    for (i = 0; i < 8; i++)
+        store_be32(block + i * 4, state[i]);
+    block[32] = 0x80;
+    block[62] = 0x01;
+    memcpy(state, IV256, sizeof(state));
+    sha256_transform(state, block, 1);
+
+    for (i = 0; i < 8; i++)
+        store_be32(out + i * 4, state[i]);
+}
+
+/*
+ * Fold a 32-byte hash through N concatenated 32-byte branch hashes:
+ * the whole Merkle walk in one call, with no interpreter dispatch or
+ * concatenation allocation per level.
+ */
+static void sha256d_fold_raw(uint8_t leaf[32], const uint8_t *branches,
+                             size_t n)
+{
+    uint8_t block[64];
+    size_t i;
+
+    memcpy(block, leaf, 32);
+    for (i = 0; i < n; i++) {
+        memcpy(block + 32, branches + i * 32, 32);
+        sha256d_64_raw(block, block);
+    }
+    memcpy(leaf, block, 32);
+}
+
+/*
+ * Midstate after absorbing the first 64 bytes of an 80-byte header.
+ * That block is constant across a nonce scan, so the miner computes it
+ * once per job and sha256d_from_midstate runs only the remaining three
+ * transforms per nonce.
+ */
+static void sha256_midstate_raw(uint8_t out[32], const uint8_t prefix[64])
+{
+    uint32_t state[8];
+    int i;
+
+    memcpy(state, IV256, sizeof(state));
+    sha256_transform(state, prefix, 1);
+    for (i = 0; i < 8; i++)
+        store_be32(out + i * 4, state[i]);
+}
+
+static void sha256d_from_midstate_raw(uint8_t out[32],
+                                      const uint8_t midstate[32],
+                                      const uint8_t tail[16])
+{
+    uint32_t state[8];
+    uint8_t block[64];
+    int i;
+
+    /* last block of the 80-byte outer hash: tail || 0x80 || bitlen 640 */
+    memset(block, 0, sizeof(block));
+    memcpy(block, tail, 16);
+    block[16] = 0x80;
+    block[62] = 0x02;
+    block[63] = 0x80;
+    for (i = 0; i < 8; i++)
+        state[i] = load_be32(midstate + i * 4);
+    sha256_transform(state, block, 1);
+
+    /* inner hash of the 32-byte digest, same shape as sha256d_64_raw */
+    memset(block, 0, sizeof(block));
+    for (i = 0; i < 8; i++)
+        store_be32(block + i * 4, state[i]);
+    block[32] = 0x80;
+    block[62] = 0x01;
+    memcpy(state, IV256, sizeof(state));
+    sha256_transform(state, block, 1);
+
+    for (i = 0; i < 8; i++)
+        store_be32(out + i * 4, state[i]);
+}
+
+/* ------------------------------------------------------------------ */
+/* Python bindings                                                    */
+/* ------------------------------------------------------------------ */
+
+static PyObject *py_sha256d(PyObject *self, PyObject *arg)
+{
+    Py_buffer view;
+    uint8_t out[32];
+
+    (void)self;
+    if (PyObject_GetBuffer(arg, &view, PyBUF_SIMPLE) < 0)
+        return NULL;
+    sha256d_raw(out, (const uint8_t *)view.buf, (size_t)view.len);
+    PyBuffer_Release(&view);
+    return PyBytes_FromStringAndSize((const char *)out, 32);
+}
+
+static PyObject *py_sha256d_64(PyObject *self, PyObject *arg)
+{
+    Py_buffer view;
+    uint8_t out[32];
+
+    (void)self;
+    if (PyObject_GetBuffer(arg, &view, PyBUF_SIMPLE) < 0)
+        return NULL;
+    if (view.len != 64) {
+        PyBuffer_Release(&view);
+        PyErr_SetString(PyExc_ValueError, "sha256d_64 requires 64 bytes");
+        return NULL;
+    }
+    sha256d_64_raw(out, (const uint8_t *)view.buf);
+    PyBuffer_Release(&view);
+    return PyBytes_FromStringAndSize((const char *)out, 32);
+}
+
+static PyObject *py_sha256d_64_batch(PyObject *self, PyObject *arg)
+{
+    Py_buffer view;
+    PyObject *out;
+    uint8_t *dst;
+    const uint8_t *src;
+    size_t i, n;
+
+    (void)self;
+    if (PyObject_GetBuffer(arg, &view, PyBUF_SIMPLE) < 0)
+        return NULL;
+    if (view.len % 64 != 0) {
+        PyBuffer_Release(&view);
+        PyErr_SetString(PyExc_ValueError,
+                        "batch input must be a multiple of 64 bytes");
+        return NULL;
+    }
+    n = (size_t)view.len / 64;
+    out = PyBytes_FromStringAndSize(NULL, (Py_ssize_t)(n * 32));
+    if (out == NULL) {
+        PyBuffer_Release(&view);
+        return NULL;
+    }
+    dst = (uint8_t *)PyBytes_AS_STRING(out);
+    src = (const uint8_t *)view.buf;
+    Py_BEGIN_ALLOW_THREADS
+    for (i = 0; i < n; i++)
+        sha256d_64_raw(dst + i * 32, src + i * 64);
+    Py_END_ALLOW_THREADS
+    PyBuffer_Release(&view);
+    return out;
+}
+
+static PyObject *py_sha256d_fold(PyObject *self, PyObject *args)
+{
+    Py_buffer leaf, branches;
+    uint8_t out[32];
+
+    (void)self;
+    if (!PyArg_ParseTuple(args, "y*y*", &leaf, &branches))
+        return NULL;
+    if (leaf.len != 32 || branches.len % 32 != 0) {
+        PyBuffer_Release(&leaf);
+        PyBuffer_Release(&branches);
+        PyErr_SetString(PyExc_ValueError,
+                        "expected a 32-byte leaf and 32-byte-aligned"
+                        " branches");
+        return NULL;
+    }
+    memcpy(out, leaf.buf, 32);
+    Py_BEGIN_ALLOW_THREADS
+    sha256d_fold_raw(out, (const uint8_t *)branches.buf,
+                     (size_t)branches.len / 32);
+    Py_END_ALLOW_THREADS
+    PyBuffer_Release(&leaf);
+    PyBuffer_Release(&branches);
+    return PyBytes_FromStringAndSize((const char *)out, 32);
+}
+
+static PyObject *py_sha256_midstate(PyObject *self, PyObject *arg)
+{
+    Py_buffer view;
+    uint8_t out[32];
+
+    (void)self;
+    if (PyObject_GetBuffer(arg, &view, PyBUF_SIMPLE) < 0)
+        return NULL;
+    if (view.len != 64) {
+        PyBuffer_Release(&view);
+        PyErr_SetString(PyExc_ValueError,
+                        "sha256_midstate requires a 64-byte prefix");
+        return NULL;
+    }
+    sha256_midstate_raw(out, (const uint8_t *)view.buf);
+    PyBuffer_Release(&view);
+    return PyBytes_FromStringAndSize((const char *)out, 32);
+}
+
+static PyObject *py_sha256d_from_midstate(PyObject *self, PyObject *args)
+{
+    Py_buffer mid, tail;
+    uint8_t out[32];
+
+    (void)self;
+    if (!PyArg_ParseTuple(args, "y*y*", &mid, &tail))
+        return NULL;
+    if (mid.len != 32 || tail.len != 16) {
+        PyBuffer_Release(&mid);
+        PyBuffer_Release(&tail);
+        PyErr_SetString(PyExc_ValueError,
+                        "expected a 32-byte midstate and 16-byte tail");
+        return NULL;
+    }
+    sha256d_from_midstate_raw(out, (const uint8_t *)mid.buf,
+                              (const uint8_t *)tail.buf);
+    PyBuffer_Release(&mid);
+    PyBuffer_Release(&tail);
+    return PyBytes_FromStringAndSize((const char *)out, 32);
+}
+
+static PyMethodDef methods[] = {
+    {"sha256d", py_sha256d, METH_O,
+     "sha256d(data) -> 32-byte double SHA-256 digest."},
+    {"sha256d_64", py_sha256d_64, METH_O,
+     "sha256d_64(data64) -> double SHA-256 of exactly 64 bytes."},
+    {"sha256d_64_batch", py_sha256d_64_batch, METH_O,
+     "sha256d_64_batch(data) -> concatenated digests of each 64-byte"
+     " lane, computed without the GIL."},
+    {"sha256d_fold", py_sha256d_fold, METH_VARARGS,
+     "sha256d_fold(leaf32, branches) -> leaf folded through each"
+     " concatenated 32-byte branch hash, without the GIL."},
+    {"sha256_midstate", py_sha256_midstate, METH_O,
+     "sha256_midstate(prefix64) -> 32-byte state after the first header"
+     " block."},
+    {"sha256d_from_midstate", py_sha256d_from_midstate, METH_VARARGS,
+     "sha256d_from_midstate(midstate, tail16) -> header double SHA-256"
+     " resumed from the per-job midstate."},
+    {NULL, NULL, 0, NULL}
+};
+
+static struct PyModuleDef moduledef = {
+    PyModuleDef_HEAD_INIT, "_sha256d_ni",
+    "Double-SHA256 with runtime SHA-NI dispatch.", -1, methods,
+    NULL, NULL, NULL, NULL
+};
+
+PyMODINIT_FUNC PyInit__sha256d_ni(void)
+{
+    PyObject *module;
+
+#ifdef HAVE_SHANI_BUILD
+    if (__builtin_cpu_supports("sha")) {
+        sha256_transform = transform_shani;
+        have_shani = 1;
+    }
+#endif
+
+    module = PyModule_Create(&moduledef);
+    if (module == NULL)
+        return NULL;
+    if (PyModule_AddIntConstant(module, "has_shani", have_shani) < 0) {
+        Py_DECREF(module);
+        return NULL;
+    }
+    return module;
+}
@@ -0,0 +1,52 @@
+"""Build the optional native helpers in place.
+
+Usage::
+
+    python setup_native.py build_ext --inplace
+
+The Python modules fall back to hashlib when the extension is missing,
+so building is optional but recommended on rigs with SHA-NI CPUs.
+
+Profile-guided optimization (optional, GCC/Clang)::
+
+    SHA256D_PGO=generate python setup_native.py build_ext --inplace
+    # ...mine for a minute so the hot paths run and .gcda files land...
+    SHA256D_PGO=use python setup_native.py build_ext --inplace --force
+
+The instrumented build records which branches the real workload takes;
+the second build lays out hot basic blocks accordingly, typically worth
+a few percent on the transform dispatch and batch loops.  For the
+interpreter itself, use a CPython built with
+``--enable-optimizations --with-lto`` — that is a deployment choice,
+not something this script controls.
+"""
+
+import os
+
+from setuptools import Extension, setup
+
+extra_compile_args = ["-O3"]
+extra_link_args = []
+
+_pgo = os.getenv("SHA256D_PGO", "")
+if _pgo == "generate":
+    extra_compile_args += ["-fprofile-generate",
+                           "-fprofile-update=prefer-atomic"]
+    extra_link_args += ["-fprofile-generate"]
+elif _pgo == "use":
+    extra_compile_args += ["-fprofile-use", "-fprofile-correction",
+                           "-flto"]
+    extra_link_args += ["-fprofile-use", "-flto"]
+
+setup(
+    name="scryptmineos-native",
+    version="1.0",
+    ext_modules=[
+        Extension(
+            "_sha256d_ni",
+            sources=["native/sha256d_ni.c"],
+            extra_compile_args=extra_compile_args,
+            extra_link_args=extra_link_args,
+        ),
+    ],
+)
@@ -0,0 +1,157 @@
+"""Minimal Stratum (v1) pool client for the scrypt GPU miner.
+
+Handles the subscribe/authorize handshake, job notifications
+(``mining.notify``), difficulty updates (``mining.set_difficulty``) and
+share submission.  Network I/O is line-oriented JSON over a plain TCP
+socket, as every scrypt pool speaks it.
+"""
+
+import binascii
+import json
+import socket
+import threading
+import time
+
+try:  # orjson decodes pool messages severalfold faster; accepts str too
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
+
+
+def difficulty_to_target(difficulty):
+    """Convert a pool share difficulty into a 256-bit target (hex string)."""
+    diff1 = 0x00000000FFFF0000000000000000000000000000000000000000000000000000
+    target = int(diff1 / difficulty)
+    return "%064x" % target
+
+
+class StratumClient:
+    """Blocking Stratum client; pair with a reader thread for async use.
+
+    Job state (``job_id``, ``target`` and friends) is mutated from
+    ``handle_notification`` and read by the mining loop, so all job-state
+    access goes through :attr:`job_lock`.
+    """
+
+    def __init__(self, host, port, username, password="x"):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+
+        self.sock = None
+        self.sock_file = None
+        self.message_id = 0
+
+        # Session state from mining.subscribe
+        self.extranonce1 = None
+        self.extranonce2_size = 4
+
+        # Current job, guarded by job_lock
+        self.job_lock = threading.Lock()
+        self.job_id = None
+        self.prevhash = None
+        self.coinb1 = None
+        self.coinb2 = None
+        self.merkle_branch = []
+        self.version = None
+        self.nbits = None
+        self.ntime = None
+        self.clean_jobs = False
+        self.difficulty = 1
+        self.target = None
+        self.target_le = None
+        self.target_int = None
+        self._update_target(difficulty_to_target(1))
+
+    def _update_target(self, target):
+        """Cache the derived forms of ``target`` for the mining loop.
+
+        Parsing hex and building the 256-bit int once per difficulty
+        change keeps them out of the per-nonce path entirely.
+        """
+        self.target = target
+        self.target_le = binascii.unhexlify(target)[::-1]
+        self.target_int = int.from_bytes(self.target_le, "little")
+        # top 64 bits, for the cheap first-stage share compare
+        self.target_hi = int.from_bytes(self.target_le[-8:], "little")
+
+    # ------------------------------------------------------------------
+    # Connection handling
+    # ------------------------------------------------------------------
+
+    def connect(self):
+        self.sock = socket.create_connection((self.host, self.port), timeout=30)
+        self.sock_file = self.sock.makefile("rw", encoding="utf-8", newline="\n")
+
+    def close(self):
+        if self.sock_file is not None:
+            self.sock_file.close()
+            self.sock_file = None
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def send_message(self, message):
+        self.message_id += 1
+        message["id"] = self.message_id
+        self.sock_file.write(json.dumps(message) + "\n")
+        self.sock_file.flush()
+        return self.message_id
+
+    def receive_message(self):
+        """Block until one JSON line arrives from the pool."""
+        line = self.sock_file.readline()
+        if not line:
+            raise ConnectionError("pool closed the connection")
+        return _json_loads(line)
+
+    # ------------------------------------------------------------------
+    # Stratum handshake
+    # ------------------------------------------------------------------
+
+    def subscribe(self):
+        self.send_message({"method": "mining.subscribe", "params": ["ScryptMineOS/1.0"]})
+        response = self.receive_message()
+        result = response["result"]
+        self.extranonce1 = result[1]
+        self.extranonce2_size = result[2]
+        return response
+
+    def authorize(self):
+        self.send_message({
+            "method": "mining.authorize",
+            "params": [self.username, self.password],
+        })
+        return self.receive_message()
+
+    # ------------------------------------------------------------------
+    # Notifications
+    # ------------------------------------------------------------------
+
+    def handle_notification(self, message):
+        """Apply a server notification (new job / difficulty change)."""
+        method = message.get("method")
+        if method == "mining.notify":
+            params = message["params"]
+            with self.job_lock:
+                self.job_id = params[0]
+                self.prevhash = params[1]
+                self.coinb1 = params[2]
+                self.coinb2 = params[3]
+                self.merkle_branch = params[4]
+                self.version = params[5]
+                self.nbits = params[6]
+                self.ntime = params[7]
+                self.clean_jobs = params[8]
+        elif method == "mining.set_difficulty":
+            with self.job_lock:
+                self.difficulty = message["params"][0]
+                self._update_target(difficulty_to_target(self.difficulty))
+
+    def submit_share(self, job_id, extranonce2, ntime, nonce):
+        self.send_message({
+            "method": "mining.submit",
+            "params": [self.username, job_id, extranonce2, ntime, nonce],
+        })
+        return time.time()
@@ -0,0 +1,304 @@
+"""Security validation for Stratum pool traffic.
+
+Every inbound pool message passes through :class:`StratumSecurityValidator`
+before the client acts on it: method whitelisting, parameter sanity,
+share-field validation and a short-window replay check.  Validation runs
+once per Stratum message, so this module is on the hot path at high share
+rates.
+"""
+
+import hashlib
+import re
+import time
+
+try:  # orjson decodes these small messages severalfold faster
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
+from collections import deque
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Dict, Iterable, List, Optional
+
+# Validation patterns, compiled once at import.  Calling re.search with a
+# string literal re-checks the re module's pattern cache on every message;
+# compiled pattern objects skip that lookup entirely.
+_METHOD_BAD_CHARS = re.compile(r"[^\w.]")
+_WORKER_BAD = re.compile(r"[<>\"']")
+# deleting every valid base58 byte must leave nothing; bytes.translate
+# runs the whole scan in C, which beats the regex engine on 34-char
+# addresses
+_B58_BYTES = b"123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+
+# scalar JSON types a parameter may contain; a tuple lets isinstance use
+# its C fastpath
+_SCALAR_TYPES = (str, int, float, bool, type(None))
+
+
+def _is_hex(value, length=None):
+    """True if ``value`` is a hex string (of ``length`` chars, if given).
+
+    ``bytes.fromhex`` is C-implemented and several times faster than the
+    regex engine for ASCII hex validation on the per-share path.
+    """
+    if not isinstance(value, str):
+        return False
+    if length is not None and len(value) != length:
+        return False
+    try:
+        bytes.fromhex(value)
+    except ValueError:
+        return False
+    return True
+
+
+class SecurityLevel(Enum):
+    LOW = "low"
+    MEDIUM = "medium"
+    HIGH = "high"
+
+
+class SecurityError(Exception):
+    """Raised when a pool message fails validation."""
+
+
+_MAX_PARAMS = {SecurityLevel.LOW: 20, SecurityLevel.MEDIUM: 15,
+               SecurityLevel.HIGH: 10}
+
+# hard cap on replay history, independent of the time window; a flood
+# within the window can no longer grow it without bound
+_HISTORY_MAXLEN = 4096
+
+
+@dataclass
+class SecurityConfig:
+    """Tunables for the validator; defaults fit a typical scrypt pool."""
+
+    security_level: SecurityLevel = SecurityLevel.MEDIUM
+    allowed_methods: Optional[Iterable[str]] = None
+    blocked_ips: Optional[Iterable[str]] = None
+    max_message_size: int = 8192
+    replay_window: float = 0.1
+    history_window: float = 600.0
+
+    def __post_init__(self):
+        # frozenset/set membership is O(1); coerce user-supplied lists too
+        if self.allowed_methods is None:
+            self.allowed_methods = frozenset({
+                "mining.subscribe",
+                "mining.authorize",
+                "mining.submit",
+                "mining.notify",
+                "mining.set_difficulty",
+                "mining.extranonce.subscribe",
+            })
+        else:
+            self.allowed_methods = frozenset(self.allowed_methods)
+        self.blocked_ips = set(self.blocked_ips or ())
+
+
+class StratumSecurityValidator:
+    """Validates raw Stratum messages and tracks a replay history."""
+
+    def __init__(self, config: Optional[SecurityConfig] = None):
+        self.config = config or SecurityConfig()
+        # (timestamp, fingerprint) pairs in arrival order; expired entries
+        # pop from the left in O(1).  The dict gives O(1) replay lookup.
+        self.message_history: deque = deque(maxlen=_HISTORY_MAXLEN)
+        self._fingerprints: Dict[bytes, float] = {}
+        self.validation_count = 0
+        self.rejected_count = 0
+        self.last_validation_time = 0.0
+        # resolved once; _validate_parameters runs per message
+        self._max_params = _MAX_PARAMS.get(self.config.security_level, 15)
+        # per-minute ring covering the 5-minute "recent" stats window
+        self._recent_ring = [0] * 5
+        self._ring_minute = int(time.time() // 60)
+
+    # ------------------------------------------------------------------
+    # Message-level validation
+    # ------------------------------------------------------------------
+
+    def validate_message(self, raw_message):
+        """Parse and validate one inbound message.
+
+        Returns the parsed dict; raises :class:`SecurityError` on any
+        violation.
+        """
+        now = time.time()  # sampled once; threaded through the sub-checks
+        if len(raw_message) > self.config.max_message_size:
+            self.rejected_count += 1
+            raise SecurityError("message exceeds size limit")
+
+        try:
+            parsed = _json_loads(raw_message)
+        except (ValueError, TypeError) as exc:
+            self.rejected_count += 1
+            raise SecurityError("malformed JSON message") from exc
+        if not isinstance(parsed, dict):
+            self.rejected_count += 1
+            raise SecurityError("message is not a JSON object")
+
+        if "method" in parsed:
+            self._validate_method_name(parsed["method"])
+            self._validate_parameters(parsed.get("params", []))
+            # one fingerprint per message, shared by the replay check and
+            # store.  Responses are exempt: the fingerprint ignores "id",
+            # and identical acknowledgements for different in-flight
+            # submissions are normal at high share rates.
+            fingerprint = self._create_message_fingerprint(parsed)
+            self._check_replay_attack(fingerprint, now)
+            self._store_message(fingerprint, now)
+        self.validation_count += 1
+        self.last_validation_time = now
+        return parsed
+
+    def _validate_method_name(self, method):
+        if not isinstance(method, str) or not method:
+            raise SecurityError("method name must be a non-empty string")
+        if _METHOD_BAD_CHARS.search(method):
+            raise SecurityError("method name contains invalid characters")
+        if method not in self.config.allowed_methods:
+            raise SecurityError("method %r is not whitelisted" % method)
+
+    def _validate_parameters(self, params):
+        if not isinstance(params, list):
+            raise SecurityError("params must be a list")
+        if len(params) > self._max_params:
+            raise SecurityError(
+                "too many parameters (limit %d)" % self._max_params)
+        for param in params:
+            if not self._is_valid_parameter_type(param):
+                raise SecurityError("parameter has unsupported type")
+
+    def _is_valid_parameter_type(self, param):
+        # explicit stack instead of recursion: no Python function call
+        # per nested element
+        stack = [param]
+        while stack:
+            value = stack.pop()
+            if isinstance(value, _SCALAR_TYPES):
+                continue
+            if isinstance(value, list):
+                stack.extend(value)
+                continue
+            if isinstance(value, dict):
+                for key, item in value.items():
+                    if not isinstance(key, str):
+                        return False
+                    stack.append(item)
+                continue
+            return False
+        return True
+
+    # ------------------------------------------------------------------
+    # Field-level validation
+    # ------------------------------------------------------------------
+
+    def validate_worker_name(self, worker):
+        if not isinstance(worker, str) or not 1 <= len(worker) <= 64:
+            return False
+        return _WORKER_BAD.search(worker) is None
+
+    def validate_address(self, address):
+        """Check a payout address (DOGE-style base58, 'D' prefix)."""
+        if not isinstance(address, str) or not 26 <= len(address) <= 35:
+            return False
+        if not address.startswith("D"):
+            return False
+        try:
+            encoded = address.encode("ascii")
+        except UnicodeEncodeError:
+            return False
+        return encoded.translate(None, _B58_BYTES) == b""
+
+    def validate_share_submission(self, params):
+        """Validate the params list of a ``mining.submit``."""
+        if not isinstance(params, list) or len(params) < 5:
+            return False
+        worker, job_id, extranonce2, ntime, nonce = params[:5]
+        if not self.validate_worker_name(worker):
+            return False
+        if not isinstance(job_id, str) or not job_id:
+            return False
+        if not _is_hex(extranonce2):
+            return False
+        if not _is_hex(ntime, 8) or not _is_hex(nonce, 8):
+            return False
+        if len(params) > 5:
+            # optional trailing share hash, e.g. for debug submissions
+            if not _is_hex(params[5], 64):
+                return False
+        return True
+
+    # ------------------------------------------------------------------
+    # Replay protection
+    # ------------------------------------------------------------------
+
+    def _prune_history(self, now):
+        window = self.config.history_window
+        history = self.message_history
+        while history and now - history[0][0] > window:
+            _, fingerprint = history.popleft()
+            self._fingerprints.pop(fingerprint, None)
+
+    def _check_replay_attack(self, fingerprint, now):
+        self._prune_history(now)
+        previous = self._fingerprints.get(fingerprint)
+        if previous is not None and now - previous < self.config.replay_window:
+            self.rejected_count += 1
+            raise SecurityError("replay attack detected")
+
+    def _advance_ring(self, minute):
+        """Zero the ring buckets between the last seen minute and now."""
+        elapsed = minute - self._ring_minute
+        if elapsed <= 0:
+            return
+        for step in range(1, min(elapsed, 5) + 1):
+            self._recent_ring[(self._ring_minute + step) % 5] = 0
+        self._ring_minute = minute
+
+    def _store_message(self, fingerprint, now):
+        minute = int(now // 60)
+        self._advance_ring(minute)
+        self._recent_ring[minute % 5] += 1
+        history = self.message_history
+        if len(history) == history.maxlen:
+            # evict explicitly so the fingerprint dict stays in sync
+            _, oldest = history.popleft()
+            self._fingerprints.pop(oldest, None)
+        history.append((now, fingerprint))
+        self._fingerprints[fingerprint] = now
+        self._prune_history(now)
+
+    def _create_message_fingerprint(self, message):
+        # BLAKE2b-128 raw bytes: faster than SHA-256 and a quarter the key
+        # size of its hexdigest.  Collision resistance against a chosen
+        # hash isn't needed for an in-process replay fingerprint.  Feeding
+        # sorted (key, repr(value)) pairs straight into the hasher skips
+        # the full JSON-encoder pass; repr is stable for the primitive and
+        # list-of-primitive values params may contain.  Iterating the
+        # message directly and skipping the excluded keys avoids a dict
+        # copy per message.
+        hasher = hashlib.blake2b(digest_size=16)
+        for key in sorted(message):
+            if key in ("id", "timestamp"):
+                continue
+            hasher.update(key.encode())
+            hasher.update(b"\x00")
+            hasher.update(repr(message[key]).encode())
+            hasher.update(b"\x01")
+        return hasher.digest()
+
+    # ------------------------------------------------------------------
+    # Introspection
+    # ------------------------------------------------------------------
+
+    def get_security_stats(self):
+        self._advance_ring(int(time.time() // 60))
+        return {
+            "messages_validated": self.validation_count,
+            "messages_rejected": self.rejected_count,
+            "recent_messages": sum(self._recent_ring),
+            "history_size": len(self.message_history),
+        }
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# the miners are top-level modules, not a package; make them importable
+# when pytest is run from anywhere
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
@@ -0,0 +1,36 @@
+"""Size-cap and permission behavior of the file sanitizer."""
+
+import os
+import stat
+
+from enterprise.security import codebase_sanitizer
+from enterprise.security.codebase_sanitizer import CodebaseSanitizer
+
+SECRET_LINE = 'password = "hunter2hunter2"\n'
+
+
+def test_oversize_file_skipped_even_off_the_walk(tmp_path, monkeypatch):
+    # candidates from ripgrep reach sanitize_file/_scan_file directly,
+    # bypassing the directory walk that normally enforces the cap
+    monkeypatch.setattr(codebase_sanitizer, "MAX_SCAN_BYTES", 1024)
+    big = tmp_path / "dump.txt"
+    big.write_text(SECRET_LINE * 200)
+    sanitizer = CodebaseSanitizer(str(tmp_path))
+    assert sanitizer.sanitize_file(str(big), "dump.txt",
+                                   dry_run=True) == []
+    assert sanitizer._scan_file(str(big), "dump.txt") == []
+    # under the cap the same content is found
+    small = tmp_path / "small.txt"
+    small.write_text(SECRET_LINE)
+    assert sanitizer._scan_file(str(small), "small.txt")
+
+
+def test_rewrite_preserves_execute_bit(tmp_path):
+    script = tmp_path / "deploy.sh"
+    script.write_text("#!/bin/sh\n" + SECRET_LINE)
+    script.chmod(0o755)
+    sanitizer = CodebaseSanitizer(str(tmp_path))
+    findings = sanitizer.sanitize_file(str(script), "deploy.sh")
+    assert findings
+    assert "[REDACTED]" in script.read_text()
+    assert stat.S_IMODE(os.stat(script).st_mode) == 0o755
@@ -0,0 +1,28 @@
+"""Difficulty-to-target conversion, including fractional vardiff."""
+
+from enhanced_stratum_client import DIFF1_TARGET, DifficultyManager
+
+
+def _target(difficulty):
+    manager = DifficultyManager()
+    manager.update_difficulty(difficulty)
+    return int.from_bytes(manager.target, "big")
+
+
+def test_integer_difficulty():
+    assert _target(1) == DIFF1_TARGET
+    assert _target(16) == DIFF1_TARGET // 16
+
+
+def test_fractional_difficulty_not_floored():
+    # 0.25 floored to 1 would shrink the target 4x and drop valid shares
+    assert _target(0.25) == DIFF1_TARGET * 4
+    # 2.5 floored to 2 would submit shares the pool rejects
+    assert _target(2.5) == int(DIFF1_TARGET / 2.5)
+    # an integer-valued float matches the exact integer division
+    assert _target(2.0) == DIFF1_TARGET // 2
+
+
+def test_degenerate_difficulty_clamped():
+    assert _target(0) == DIFF1_TARGET
+    assert _target(-3) == DIFF1_TARGET
@@ -0,0 +1,95 @@
+"""Known-vector tests for block-header construction.
+
+The reference header is built field by field with only ``struct`` and
+``hashlib`` — independently of :mod:`hashing` — so a transform bug in
+either implementation shows up as a mismatch.  The prevhash word swap
+in particular is covered explicitly: Stratum sends it pre-swapped per
+32-bit word, and a whole-buffer reversal silently invalidates every
+share.
+"""
+
+import hashlib
+import struct
+
+import hashing
+from enhanced_stratum_client import EnhancedStratumClient, ExtranonceManager
+
+# a representative mining.notify, fields as they arrive on the wire
+JOB_ID = "b1f2"
+PREVHASH = "69fc72e76db0e764615a858f483e3566e42d56b2bc7a03adce9492887010eda8"
+COINB1 = ("01000000010000000000000000000000000000000000000000000000000000"
+          "000000000000ffffffff2003a5c3040c")
+COINB2 = "0d2f6e6f64655374726174756d2f000000000100f2052a010000001976a914"
+MERKLE_BRANCH = [
+    "2791e3e6f54831bcfc2b493b4d2fbd2c0c4a28e92eb0c7cb05fed1649f1f1cc6",
+    "d91a80bd7c17a69d4c0ae5c3b27d5bd2a04b7d9b48b11f48e5d7b0ef2d4ebd08",
+]
+VERSION = "20000000"
+NBITS = "1a01cb4c"
+NTIME = "66bfa000"
+EXTRANONCE1 = "f8002c90"
+EXTRANONCE2 = "01000000"
+
+
+def _sha256d(data):
+    return hashlib.sha256(hashlib.sha256(data).digest()).digest()
+
+
+def _reference_header(nonce):
+    """The header as cpuminer/bfgminer/nightminer assemble it."""
+    coinbase = bytes.fromhex(COINB1 + EXTRANONCE1 + EXTRANONCE2 + COINB2)
+    root = _sha256d(coinbase)
+    for branch in MERKLE_BRANCH:
+        root = _sha256d(root + bytes.fromhex(branch))
+    prevhash = struct.pack(
+        "<8I", *struct.unpack(">8I", bytes.fromhex(PREVHASH)))
+    return (bytes.fromhex(VERSION)[::-1] + prevhash + root
+            + bytes.fromhex(NTIME)[::-1] + bytes.fromhex(NBITS)[::-1]
+            + struct.pack("<I", nonce))
+
+
+def test_swap_prevhash_words():
+    expected = struct.pack(
+        "<8I", *struct.unpack(">8I", bytes.fromhex(PREVHASH)))
+    assert hashing.swap_prevhash_words(PREVHASH) == expected
+    # a whole-buffer reversal is the historical bug, not the transform
+    assert hashing.swap_prevhash_words(PREVHASH) != \
+        bytes.fromhex(PREVHASH)[::-1]
+
+
+def test_construct_block_header_matches_reference():
+    root = hashing.build_merkle_root(
+        hashing.build_coinbase(COINB1, EXTRANONCE1, EXTRANONCE2, COINB2),
+        MERKLE_BRANCH)
+    header = hashing.construct_block_header(VERSION, PREVHASH, root,
+                                            NTIME, NBITS, nonce=7)
+    assert header == _reference_header(7)
+    assert len(header) == 80
+
+
+def test_construct_block_headers_matches_reference():
+    headers = hashing.construct_block_headers(
+        VERSION, PREVHASH, NTIME, NBITS, COINB1, EXTRANONCE1, COINB2,
+        MERKLE_BRANCH, [EXTRANONCE2])
+    assert headers == [_reference_header(0)]
+
+
+def test_prepare_job_builds_reference_header():
+    client = EnhancedStratumClient("pool.example", 3333, "wallet.worker")
+    client.extranonce_manager = ExtranonceManager(EXTRANONCE1, 4)
+    client.handle_notification({
+        "method": "mining.notify",
+        "params": [JOB_ID, PREVHASH, COINB1, COINB2, MERKLE_BRANCH,
+                   VERSION, NBITS, NTIME, True],
+    })
+    assert client.job_extranonce2 == EXTRANONCE2
+    assert bytes(client._header_buf) == _reference_header(0)
+    # the ntime echoed back on submit must be the wire-format hex
+    assert client.ntime_be[::-1].hex() == NTIME
+
+
+def test_midstate_path_matches_full_hash():
+    header = _reference_header(0xDEADBEEF)
+    midstate = hashing.header_midstate(header[:64])
+    assert hashing.sha256d_from_midstate(midstate, header[64:]) == \
+        hashing.sha256d(header)
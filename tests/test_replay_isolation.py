@@ -0,0 +1,25 @@
+"""Replay protection must be scoped to a single connection."""
+
+import pytest
+
+from enhanced_stratum_client import EnhancedStratumClient
+from stratum_security import SecurityError
+
+SET_DIFF = b'{"id":null,"method":"mining.set_difficulty","params":[8]}\n'
+
+
+def test_validators_are_per_connection():
+    ltc = EnhancedStratumClient("ltc.pool", 3333, "w")
+    doge = EnhancedStratumClient("doge.pool", 8057, "w")
+    assert ltc.security_validator is not doge.security_validator
+    # both pools sending the same notification back to back is
+    # routine in split mode and must pass on each connection
+    ltc.security_validator.validate_message(SET_DIFF)
+    doge.security_validator.validate_message(SET_DIFF)
+
+
+def test_replay_still_rejected_within_one_connection():
+    client = EnhancedStratumClient("pool", 3333, "w")
+    client.security_validator.validate_message(SET_DIFF)
+    with pytest.raises(SecurityError):
+        client.security_validator.validate_message(SET_DIFF)
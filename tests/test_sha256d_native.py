@@ -0,0 +1,51 @@
+"""Cross-checks of the native sha256d extension against hashlib.
+
+Every entry point has a trivial pure-Python oracle; if the extension is
+not built the module-level skip leaves the hashlib fallback (already
+exercised through :mod:`hashing` elsewhere) as the only path.
+"""
+
+import hashlib
+
+import pytest
+
+_sha256d_ni = pytest.importorskip("_sha256d_ni")
+
+
+def _sha256d(data):
+    return hashlib.sha256(hashlib.sha256(data).digest()).digest()
+
+
+@pytest.mark.parametrize("size", [0, 1, 55, 56, 64, 80, 200, 4096])
+def test_sha256d_matches_hashlib(size):
+    data = bytes(range(256)) * (size // 256 + 1)
+    data = data[:size]
+    assert _sha256d_ni.sha256d(data) == _sha256d(data)
+
+
+def test_sha256d_64_matches_hashlib():
+    block = bytes(range(64))
+    assert _sha256d_ni.sha256d_64(block) == _sha256d(block)
+
+
+def test_sha256d_64_batch_matches_hashlib():
+    blocks = [bytes([i]) * 64 for i in range(5)]
+    digests = _sha256d_ni.sha256d_64_batch(b"".join(blocks))
+    for i, block in enumerate(blocks):
+        assert digests[i * 32:(i + 1) * 32] == _sha256d(block)
+
+
+def test_sha256d_fold_matches_iterated_hashlib():
+    leaf = _sha256d(b"coinbase")
+    branch = [_sha256d(bytes([i])) for i in range(4)]
+    expected = leaf
+    for node in branch:
+        expected = _sha256d(expected + node)
+    assert _sha256d_ni.sha256d_fold(leaf, b"".join(branch)) == expected
+
+
+def test_midstate_matches_full_hash():
+    header = bytes(range(80, 160))
+    midstate = _sha256d_ni.sha256_midstate(header[:64])
+    assert _sha256d_ni.sha256d_from_midstate(midstate, header[64:]) == \
+        _sha256d(header)